@@ -3,8 +3,6 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import functools
-import importlib.metadata
-import importlib.util
 import shlex
 import subprocess
 import sys
@@ -12,7 +10,6 @@ import typing as t
 from collections import defaultdict
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from textwrap import dedent
 
 import dotenv
 import rtoml
@@ -20,7 +17,7 @@ import tabulate
 import typer
 
 from pogo_migrate import exceptions, migrate, sql, squash, yoyo
-from pogo_migrate.config import Config, load_config
+from pogo_migrate.config import Config, load_config, load_toml
 from pogo_migrate.context import Context
 from pogo_migrate.migration import Migration, read_sql_migration, topological_sort
 from pogo_migrate.util import get_editor, make_file
@@ -43,8 +40,9 @@ def load_dotenv() -> None:
 def _version_callback(*, value: bool) -> None:
     """Get current cli version."""
     if value:  # pragma: no cover
-        version = importlib.metadata.version("pogo-migrate")
-        typer.echo(f"pogo-migrate {version}")
+        from importlib.metadata import version
+
+        typer.echo(f"pogo-migrate {version('pogo-migrate')}")
         raise typer.Exit
 
 
@@ -126,11 +124,10 @@ def init(
     @handle_exceptions(context)  # type: ignore[reportCallIssue]
     async def init_() -> None:
         pyproject = Path("pyproject.toml")
-        if not pyproject.exists():
-            pyproject.touch()
-
-        with pyproject.open() as f:  # noqa: ASYNC230
-            data = rtoml.load(f)
+        try:
+            data = load_toml(pyproject)
+        except FileNotFoundError:
+            data = {}
 
         if "tool" in data and "pogo" in data["tool"]:
             context.error("pogo already configured.")
@@ -160,50 +157,44 @@ def init(
         if typer.confirm(f"Write configuration to {pyproject.absolute()}"):
             loc.mkdir(exist_ok=True, parents=True)
             with pyproject.open("a") as f:  # noqa: ASYNC230
-                f.write("\n")
-                f.write(config)
+                f.write(f"\n{config}")
 
     asyncio.run(init_())
 
 
-migration_template: str = dedent(
-    '''\
-    """
-    {message}
-    """
+migration_template: str = '''\
+"""
+{message}
+"""
 
-    __depends__ = [{depends}]
+__depends__ = [{depends}]
 
 
-    async def apply(db):
-        ...
+async def apply(db):
+    ...
 
 
-    async def rollback(db):
-        ...
-    ''',
-)
+async def rollback(db):
+    ...
+'''
 
-migration_sql_template: str = dedent(
-    """\
-    --{message}
-    -- depends:{depends}
+migration_sql_template: str = """\
+--{message}
+-- depends:{depends}
 
-    -- migrate: apply
+-- migrate: apply
 
-    -- migrate: rollback
+-- migrate: rollback
 
-    """,
-)
+"""
 
 
 def retry(context: Context) -> str:
-    choice = ""
-    while choice == "":
-        choice = typer.prompt("Retry editing? [Ynqh]", default="y", show_default=False)
+    while True:
+        choice = typer.prompt("Retry editing? [Ynqh]", default="y", show_default=False).lower()
         if choice == "q":
             raise typer.Exit(code=0)
-        if choice in "yn":
+        if choice in {"y", "n"}:
             return choice
         if choice == "h":
             context.error("""\
@@ -212,10 +203,6 @@ n: save the migration as-is, without re-editing
 q: quit without saving the migration
 h: show this help
 """)
-        choice = ""
-
-    # Unreachable
-    return ""  # pragma: no cover
 
 
 def create_with_editor(config: Config, content: str, extension: str, context: Context) -> Path:
@@ -716,7 +703,7 @@ def validate(
             statements += [c[1].get("query") or c[0][0] for c in mock_asyncpg.fetchval.call_args_list]
         else:
             _, _, _, _, _, apply_statements, rollback_statements = read_sql_migration(migration.path)
-            statements = apply_statements + rollback_statements
+            statements = [*apply_statements, *rollback_statements]
 
         for statement in statements:
             try:
@@ -769,14 +756,16 @@ def mark(
         migrations = await sql.read_migrations(config.migrations, db)
         migrations = topological_sort([m.load() for m in migrations if migration_id is None or m.id == migration_id])
 
-        async with db.transaction():
-            for migration in migrations:
-                migration.load()
-                if not migration.applied:
-                    if interactive and not typer.confirm(f"Mark {migration.id} as applied?"):
-                        break
+        marked = []
+        for migration in migrations:
+            if not migration.applied:
+                if interactive and not typer.confirm(f"Mark {migration.id} as applied?"):
+                    break
+
+                marked.append((migration.id, migration.hash))
 
-                    await sql.migration_applied(db, migration.id, migration.hash)
+        async with db.transaction():
+            await sql.migrations_applied(db, marked)
 
     asyncio.run(_mark())
 
@@ -816,14 +805,16 @@ def unmark(
             topological_sort([m.load() for m in migrations if migration_id is None or m.id == migration_id]),
         )
 
-        async with db.transaction():
-            for migration in migrations:
-                migration.load()
-                if migration.applied:
-                    if not typer.confirm(f"Unmark {migration.id} as applied?"):
-                        break
+        unmarked = []
+        for migration in migrations:
+            if migration.applied:
+                if not typer.confirm(f"Unmark {migration.id} as applied?"):
+                    break
 
-                    await sql.migration_unapplied(db, migration.id)
+                unmarked.append(migration.id)
+
+        async with db.transaction():
+            await sql.migrations_unapplied(db, unmarked)
 
     asyncio.run(_unmark())
 
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import copy
 import dataclasses
+import functools
 import os
+import stat
 import typing as t
 from pathlib import Path
 from string import Formatter
@@ -13,14 +16,19 @@ from pogo_migrate import exceptions
 CONFIG_FILENAME = "pyproject.toml"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class Config:
+    __slots__ = ("database_config", "migrations", "root_directory")
+
     root_directory: Path
     migrations: Path
     database_config: str
 
     @property
     def database_dsn(self: t.Self) -> str:
+        if "{" not in self.database_config:
+            return self.database_config
+
         try:
             format_kwargs = {
                 k[1]: os.environ[k[1]] for k in Formatter().parse(self.database_config) if k[1] is not None
@@ -33,9 +41,11 @@ class Config:
 
     @classmethod
     def from_dict(cls: type[Config], data: dict[str, str], root_directory: Path) -> Config:
-        data["root_directory"] = root_directory  # type: ignore[reportArgumentType]
-        data["migrations"] = root_directory / data["migrations"]  # type: ignore[reportArgumentType]
-        return cls(**data)  # type: ignore[reportArgumentType]
+        return cls(
+            root_directory=root_directory,
+            migrations=root_directory / data["migrations"],
+            database_config=data["database_config"],
+        )
 
 
 def find_config() -> Path | None:
@@ -43,20 +53,34 @@ def find_config() -> Path | None:
     d = Path.cwd()
     while d != d.parent:
         path = d / CONFIG_FILENAME
-        if path.is_file():
-            return path
+        try:
+            mode = os.stat(path).st_mode  # noqa: PTH116
+        except OSError:
+            pass
+        else:
+            if stat.S_ISREG(mode):
+                return path
         d = d.parent
     return None
 
 
+def load_toml(path: Path) -> dict[str, t.Any]:
+    """Parse a toml file, reusing the previous parse while the file contents are unchanged."""
+    return copy.deepcopy(_parse_toml(path.read_text()))
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_toml(contents: str) -> dict[str, t.Any]:
+    return rtoml.loads(contents)
+
+
 def load_config() -> Config:
     config = find_config()
     if config is None:
         msg = f"No configuration found, missing {CONFIG_FILENAME}, run 'pogo init ...'"
         raise exceptions.InvalidConfigurationError(msg)
 
-    with config.open() as f:
-        data = rtoml.load(f)
+    data = load_toml(config)
 
     if "tool" not in data or "pogo" not in data["tool"]:
         msg = "No configuration found, run 'pogo init ...'"
@@ -34,16 +34,16 @@ async def transaction(db: asyncpg.Connection, migration: Migration) -> t.AsyncIt
 async def apply(context: Context, config: Config, db: asyncpg.Connection) -> None:
     await sql.ensure_pogo_sync(db)
     migrations = await sql.read_migrations(config.migrations, db)
-    migrations = topological_sort([m.load() for m in migrations])
+    pending = [m for m in migrations if not m.applied]
+    if not pending:
+        return
 
-    for migration in migrations:
+    for migration in topological_sort([m.load() for m in pending]):
         try:
-            migration.load()
-            if not migration.applied:
-                context.warning("Applying %s", migration.id)
-                async with transaction(db, migration):
-                    await migration.apply(db)
-                    await sql.migration_applied(db, migration.id, migration.hash)
+            context.warning("Applying %s", migration.id)
+            async with transaction(db, migration):
+                await migration.apply(db)
+                await sql.migration_applied(db, migration.id, migration.hash)
         except Exception as e:  # noqa: PERF203
             msg = f"Failed to apply {migration.id}"
             raise exceptions.BadMigrationError(msg) from e
@@ -52,19 +52,21 @@ async def apply(context: Context, config: Config, db: asyncpg.Connection) -> Non
 async def rollback(context: Context, config: Config, db: asyncpg.Connection, count: int | None = None) -> None:
     await sql.ensure_pogo_sync(db)
     migrations = await sql.read_migrations(config.migrations, db)
-    migrations = reversed(list(topological_sort([m.load() for m in migrations])))
+    applied = [m for m in migrations if m.applied]
+    if not applied:
+        return
+
+    migrations = topological_sort([m.load() for m in applied])[::-1]
+    if count is not None:
+        migrations = migrations[: max(count, 0)]
 
-    i = 0
     for migration in migrations:
         try:
-            migration.load()
-            if migration.applied and (count is None or i < count):
-                context.warning("Rolling back %s", migration.id)
+            context.warning("Rolling back %s", migration.id)
 
-                async with transaction(db, migration):
-                    await migration.rollback(db)
-                    await sql.migration_unapplied(db, migration.id)
-                    i += 1
+            async with transaction(db, migration):
+                await migration.rollback(db)
+                await sql.migration_unapplied(db, migration.id)
         except Exception as e:  # noqa: PERF203
             msg = f"Failed to rollback {migration.id}"
             raise exceptions.BadMigrationError(msg) from e
@@ -1,20 +1,19 @@
 from __future__ import annotations
 
-import hashlib
-import importlib.util
+import functools
 import re
 import typing as t
-
-import asyncpg
-import sqlparse
+import weakref
 
 from pogo_migrate import exceptions, topologicalsort
 
 if t.TYPE_CHECKING:
     from pathlib import Path
 
+    import asyncpg
+
 
-MigrationFunc = t.Callable[[asyncpg.Connection], t.Coroutine[t.Any, t.Any, t.Any]]
+MigrationFunc = t.Callable[["asyncpg.Connection"], t.Coroutine[t.Any, t.Any, t.Any]]
 
 
 def strip_comments(statement: str) -> str:
@@ -30,69 +29,170 @@ def terminate_statements(statements: list[str]) -> list[str]:
     return statements
 
 
+# Tokens that can start or end a statement, anything else is skipped by the regex engine.
+_SPLIT_TOKENS = re.compile(
+    r"""
+    (?P<comment>--[^\r\n]*(?:\r\n|\r|\n)?)
+    |(?P<block>/\*.*?\*/)
+    |(?P<quote>'[^'\\]*(?:''[^'\\]*)*'|"[^"\\]*(?:""[^"\\]*)*")
+    |(?P<dollar>(?<![\w"$])\$(?:[_A-ZÀ-Ü]\w*)?\$)
+    |(?P<open>\()
+    |(?P<close>\))
+    |(?P<end>;)
+    |(?P<unsupported>[\\`\u00b4#%'"]|/\*|(?<![\w\])])\[|[+/@^&|][-/])
+    """,
+    re.IGNORECASE | re.DOTALL | re.VERBOSE,
+)
+# Keywords sqlparse uses to track procedural blocks.
+_SPLIT_BLOCK_KEYWORDS = re.compile(r"\b(?:BEGIN|END|DECLARE|GO)\b", re.IGNORECASE)
+
+
+def _statement_end(sql: str, pos: int) -> int:
+    """Trailing whitespace and line comments belong to the terminated statement."""
+    while pos < len(sql):
+        if sql.startswith("--", pos) and not sql.startswith("--+", pos):
+            pos = _SPLIT_TOKENS.match(sql, pos).end()  # type: ignore[union-attr]
+        elif sql[pos] not in "\r\n" and sql[pos].isspace():
+            pos += 1
+        else:
+            break
+    return pos
+
+
+def _split_statements(sql: str) -> list[str] | None:
+    statements = []
+    start = pos = depth = 0
+    while (match := _SPLIT_TOKENS.search(sql, pos)) is not None:
+        kind = match.lastgroup
+        if kind == "unsupported" or _SPLIT_BLOCK_KEYWORDS.search(sql, pos, match.start()):
+            return None
+        pos = match.end()
+        if kind == "dollar":
+            # Dollar quote tags are case sensitive, `$q$` is not closed by `$Q$`.
+            close = sql.find(match.group(), pos)
+            if close == -1:
+                return None
+            pos = close + len(match.group())
+        elif kind in ("open", "close"):
+            depth += 1 if kind == "open" else -1
+        elif kind == "end" and depth <= 0:
+            pos = _statement_end(sql, pos)
+            statements.append(sql[start:pos].strip())
+            start, depth = pos, 0
+
+    if _SPLIT_BLOCK_KEYWORDS.search(sql, pos):
+        return None
+    if sql[start:].strip():
+        statements.append(sql[start:].strip())
+    return statements
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split sql into statements.
+
+    Plain DDL/DML is split with a regex scan over quotes, comments and
+    parentheses, dollar quote tags are matched case sensitively as postgres
+    does. Sql that relies on sqlparse's keyword handling (procedural blocks,
+    backslash escapes, quoted identifier variants) falls back to
+    `sqlparse.split`.
+    """
+    statements = _split_statements(sql)
+    if statements is None:
+        import sqlparse
+
+        statements = sqlparse.split(sql)
+    return statements
+
+
+def statements_executor(statements: list[str], *, use_transaction: bool) -> MigrationFunc:
+    """Build the function that executes a sql migration's statements.
+
+    Transactional migrations are sent to the database as a single
+    multi-statement query. Non transactional migrations execute each
+    statement separately, as statements such as `CREATE INDEX CONCURRENTLY`
+    can not run inside the implicit transaction of a multi-statement query.
+    """
+    # Skip comments
+    final_statements = tuple(statement_ for statement_ in (strip_comments(s) for s in statements) if statement_)
+
+    if use_transaction:
+        query = "\n".join(final_statements)
+
+        async def execute(db: asyncpg.Connection) -> None:
+            if query:
+                await db.execute(query)
+
+        return execute
+
+    async def execute_each(db: asyncpg.Connection) -> None:
+        for statement in final_statements:
+            await db.execute(statement)
+
+    return execute_each
+
+
 def read_sql_migration(
     path: Path,
-) -> tuple[str, str, MigrationFunc, MigrationFunc, bool, list[str], list[str]]:
+) -> tuple[str, str, MigrationFunc, MigrationFunc, bool, tuple[str, ...], tuple[str, ...]]:
     """Read a sql migration.
 
     Parse the message, [depends], apply statements, and rollback statements.
+    Parsed migrations are cached by file contents.
     """
-    with path.open() as f:
-        contents = f.read()
-        try:
-            metadata, contents = contents.split("-- migrate: apply")
-        except ValueError as e:
-            msg = f"{path.name}: No '-- migrate: apply' found."
-            raise exceptions.BadMigrationError(msg) from e
-
-        m = re.match(r".*--(.*)\s-- depends:(.*)[\s]?", metadata.strip())
-
-        if m is None:
-            msg = f"{path.name}: No '-- depends:' or message found."
-            raise exceptions.BadMigrationError(msg)
+    return _read_sql_migration(path.name, path.read_text(encoding="utf-8"))
+
+
+@functools.lru_cache(maxsize=512)
+def _read_sql_migration(
+    name: str,
+    contents: str,
+) -> tuple[str, str, MigrationFunc, MigrationFunc, bool, tuple[str, ...], tuple[str, ...]]:
+    metadata, sep, contents = contents.partition("-- migrate: apply")
+    if not sep:
+        msg = f"{name}: No '-- migrate: apply' found."
+        raise exceptions.BadMigrationError(msg)
 
-        message: str = m[1].strip()
-        depends: str = m[2].strip()
-        use_transaction = "-- transaction: false" not in metadata
+    lines = [line.strip() for line in metadata.strip().splitlines() if line.strip()]
+    if len(lines) < 2 or "--" not in lines[0] or not lines[1].startswith("-- depends:"):  # noqa: PLR2004
+        msg = f"{name}: No '-- depends:' or message found."
+        raise exceptions.BadMigrationError(msg)
 
-        try:
-            apply_content, rollback_content = contents.split("-- migrate: rollback")
-        except ValueError as e:
-            msg = f"{path.name}: No '-- migrate: rollback' found."
-            raise exceptions.BadMigrationError(msg) from e
+    message: str = lines[0].rpartition("--")[2].strip()
+    depends: str = lines[1][len("-- depends:") :].strip()
+    use_transaction = "-- transaction: false" not in metadata
 
-        apply_statements = terminate_statements(sqlparse.split(apply_content.strip()))
+    apply_content, sep, rollback_content = contents.partition("-- migrate: rollback")
+    if not sep:
+        msg = f"{name}: No '-- migrate: rollback' found."
+        raise exceptions.BadMigrationError(msg)
 
-        async def apply(db: asyncpg.Connection) -> None:
-            for statement in apply_statements:
-                # Skip comments
-                statement_ = strip_comments(statement)
-                if statement_:
-                    await db.execute(statement_)
+    apply_statements = terminate_statements(split_statements(apply_content.strip()))
+    apply = statements_executor(apply_statements, use_transaction=use_transaction)
 
-        rollback_statements = terminate_statements(sqlparse.split(rollback_content.strip()))
+    rollback_statements = terminate_statements(split_statements(rollback_content.strip()))
+    rollback = statements_executor(rollback_statements, use_transaction=use_transaction)
 
-        async def rollback(db: asyncpg.Connection) -> None:
-            for statement in rollback_statements:
-                # Skip comments
-                statement_ = strip_comments(statement)
-                if statement_:
-                    await db.execute(statement_)
+    return message, depends, apply, rollback, use_transaction, tuple(apply_statements), tuple(rollback_statements)
 
-        return message, depends, apply, rollback, use_transaction, apply_statements, rollback_statements
+
+@functools.lru_cache(maxsize=4096)
+def _mig_hash(mig_id: str) -> str:
+    import hashlib
+
+    return hashlib.sha256(mig_id.encode("utf-8")).hexdigest()
 
 
 class Migration:
-    __migrations: t.ClassVar[dict[str, Migration]] = {}
+    __migrations: t.ClassVar[weakref.WeakValueDictionary[str, Migration]] = weakref.WeakValueDictionary()
 
-    def __init__(self: t.Self, mig_id: str, path: Path, applied_migrations: set[str] | None) -> None:
-        applied_migrations = applied_migrations or set()
+    def __init__(self: t.Self, mig_id: str, path: Path, applied_migrations: t.AbstractSet[str] | None) -> None:
+        applied_migrations = applied_migrations or frozenset()
         self.id = mig_id
         self.path = path
-        self.hash: str = hashlib.sha256(mig_id.encode("utf-8")).hexdigest()
+        self.hash: str = _mig_hash(mig_id)
         self._use_transaction: bool = True
         self._doc: str | None = None
-        self._depends: set[Migration] | None = None
+        self._depends: frozenset[Migration] | None = None
         self._apply: MigrationFunc | None = None
         self._rollback: MigrationFunc | None = None
         self._applied = self.id in applied_migrations
@@ -106,16 +206,16 @@ class Migration:
         return self._applied
 
     @property
-    def depends(self: t.Self) -> set[Migration]:
-        return self._depends or set()
+    def depends(self: t.Self) -> frozenset[Migration]:
+        return self._depends or frozenset()
 
     @property
     def use_transaction(self: t.Self) -> bool:
         return self._use_transaction
 
     @property
-    def depends_ids(self: t.Self) -> set[str]:
-        return {m.id for m in self.depends}
+    def depends_ids(self: t.Self) -> frozenset[str]:
+        return frozenset(m.id for m in self.depends)
 
     @property
     def is_sql(self: t.Self) -> bool:
@@ -141,6 +241,8 @@ class Migration:
             self._use_transaction = in_transaction
             depends_ = depends.split()
         else:
+            import importlib.util
+
             spec = importlib.util.spec_from_file_location(
                 str(self.path),
                 str(self.path),
@@ -169,7 +271,7 @@ class Migration:
             msg = f"Could not resolve dependencies for '{self.path.name}'"
             raise exceptions.BadMigrationError(msg)
 
-        self._depends = {d for d in found_dependencies if d is not None}
+        self._depends = frozenset(d for d in found_dependencies if d is not None)
 
         return self
 
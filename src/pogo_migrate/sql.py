@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import typing as t
 
 import asyncpg
@@ -17,75 +18,94 @@ async def get_connection(connection_string: str) -> asyncpg.Connection:
 
 
 async def read_migrations(migrations_location: Path, db: asyncpg.Connection | None) -> list[Migration]:
-    applied_migrations = await get_applied_migrations(db) if db else set()
+    applied_migrations = await get_applied_migrations(db) if db else frozenset()
+    with os.scandir(migrations_location) as entries:
+        names = [entry.name for entry in entries if entry.name.endswith((".py", ".sql"))]
+
     return [
-        Migration(path.stem, path, applied_migrations)
-        for path in migrations_location.iterdir()
-        if path.suffix in {".py", ".sql"}
+        Migration(name[:-3] if name.endswith(".py") else name[:-4], migrations_location / name, applied_migrations)
+        for name in names
     ]
 
 
-async def get_applied_migrations(db: asyncpg.Connection) -> set[str]:
+async def get_applied_migrations(db: asyncpg.Connection) -> frozenset[str]:
+    """Fetch the ids of applied migrations, results are not cached."""
+    # Aggregate server side, a single array value avoids building a Record per row.
     stmt = """
     SELECT
-        migration_id
+        array_agg(migration_id)
     FROM _pogo_migration
     """
-    results = await db.fetch(stmt)
+    results = await db.fetchval(stmt)
 
-    return {r["migration_id"] for r in results}
+    return frozenset(results or ())
 
 
 async def ensure_pogo_sync(db: asyncpg.Connection) -> None:
+    # Check and create in a single round trip, the DO block only issues DDL
+    # when the tables are missing so read only connections are unaffected.
     stmt = """
-    SELECT exists (
-        SELECT FROM pg_tables
-        WHERE  schemaname = 'public'
-        AND    tablename  = '_pogo_version'
-    );
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT FROM pg_tables
+            WHERE  schemaname = 'public'
+            AND    tablename  = '_pogo_version'
+        ) THEN
+            CREATE TABLE _pogo_migration (
+                migration_hash VARCHAR(64),  -- sha256 hash of the migration id
+                migration_id VARCHAR(255),   -- The migration id (ie path basename without extension)
+                applied TIMESTAMPTZ,         -- When this id was applied
+                PRIMARY KEY (migration_hash)
+            );
+
+            CREATE TABLE _pogo_version (
+                version INT NOT NULL PRIMARY KEY,
+                installed TIMESTAMPTZ
+            );
+
+            INSERT INTO _pogo_version (version, installed) VALUES (0, now());
+        END IF;
+    END
+    $$;
     """
-    r = await db.fetchrow(stmt)
-    if r is not None and not r["exists"]:
-        stmt = """
-        CREATE TABLE _pogo_migration (
-            migration_hash VARCHAR(64),  -- sha256 hash of the migration id
-            migration_id VARCHAR(255),   -- The migration id (ie path basename without extension)
-            applied TIMESTAMPTZ,         -- When this id was applied
-            PRIMARY KEY (migration_hash)
-        )
-        """
-        await db.execute(stmt)
-
-        stmt = """
-        CREATE TABLE _pogo_version (
-            version INT NOT NULL PRIMARY KEY,
-            installed TIMESTAMPTZ
-        )
-        """
-        await db.execute(stmt)
-
-        stmt = """
-        INSERT INTO _pogo_version (version, installed) VALUES (0, now())
-        """
-        await db.execute(stmt)
+    await db.execute(stmt)
+
+
+# Shared by the single and batch variants so that they reuse the same entry
+# in asyncpg's per-connection prepared statement cache.
+MIGRATION_APPLIED_STMT = """
+INSERT INTO _pogo_migration (
+    migration_hash,
+    migration_id,
+    applied
+) VALUES (
+    $1, $2, now()
+)
+"""
+
+MIGRATION_UNAPPLIED_STMT = """
+DELETE FROM _pogo_migration
+WHERE migration_id = $1
+"""
 
 
 async def migration_applied(db: asyncpg.Connection, migration_id: str, migration_hash: str) -> None:
-    stmt = """
-    INSERT INTO _pogo_migration (
-        migration_hash,
-        migration_id,
-        applied
-    ) VALUES (
-        $1, $2, now()
+    await db.execute(MIGRATION_APPLIED_STMT, migration_hash, migration_id)
+
+
+async def migrations_applied(db: asyncpg.Connection, migrations: list[tuple[str, str]]) -> None:
+    """Record multiple (migration_id, migration_hash) pairs in one batch."""
+    await db.executemany(
+        MIGRATION_APPLIED_STMT,
+        [(migration_hash, migration_id) for migration_id, migration_hash in migrations],
     )
-    """
-    await db.execute(stmt, migration_hash, migration_id)
 
 
 async def migration_unapplied(db: asyncpg.Connection, migration_id: str) -> None:
-    stmt = """
-    DELETE FROM _pogo_migration
-    WHERE migration_id = $1
-    """
-    await db.execute(stmt, migration_id)
+    await db.execute(MIGRATION_UNAPPLIED_STMT, migration_id)
+
+
+async def migrations_unapplied(db: asyncpg.Connection, migration_ids: list[str]) -> None:
+    """Remove multiple migration_ids in one batch."""
+    await db.executemany(MIGRATION_UNAPPLIED_STMT, [(migration_id,) for migration_id in migration_ids])
@@ -1,37 +1,53 @@
 from __future__ import annotations
 
+import functools
 import re
 import typing as t
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from textwrap import dedent
 
 import sqlglot
 import sqlparse
+import sqlparse.lexer
 from sqlglot import expressions as exp
 
+from pogo_migrate.context import Verbosity
 from pogo_migrate.migration import Migration
 
 if t.TYPE_CHECKING:
     from pogo_migrate.context import Context
 
 
-squash_sql_template: str = dedent(
-    """\
-    --{message}
-    -- depends:{depends}
+squash_sql_template: str = """\
+--{message}
+-- depends:{depends}
 
-    -- squashed: {squashed}
+-- squashed: {squashed}
 
-    -- migrate: apply
+-- migrate: apply
 
-    {apply}
+{apply}
 
-    -- migrate: rollback
+-- migrate: rollback
 
-    {rollback}
-    """,
-)
+{rollback}
+"""
+
+
+def _replace_depends(content: str, mig_id: str, new_depends: str) -> str:
+    """Replace references to mig_id with new_depends in a single pass."""
+    pattern = re.compile(
+        rf'(?P<python>__depends__ = \["{re.escape(mig_id)}"\])|{re.escape(mig_id)}|__depends__ = \[""\]',
+    )
+
+    def replacement(m: re.Match) -> str:
+        if m["python"] is not None:
+            # Handle python becoming initial migration.
+            return f'__depends__ = ["{new_depends}"]' if new_depends else "__depends__ = []"
+        return new_depends if m.group() == mig_id else "__depends__ = []"
+
+    return pattern.sub(replacement, content)
 
 
 def remove(context: Context, current: Migration, dependent: Migration | None, *, backup: bool = False) -> None:
@@ -39,11 +55,7 @@ def remove(context: Context, current: Migration, dependent: Migration | None, *,
     new_depends = ", ".join(current.depends_ids)
     if dependent:
         content = dependent.path.read_text()
-        dependent.path.write_text(
-            content.replace(current.id, new_depends)
-            # Handle python becoming initial migration.
-            .replace('__depends__ = [""]', "__depends__ = []"),
-        )
+        dependent.path.write_text(_replace_depends(content, current.id, new_depends))
         dependent.load()
     if backup:
         current.path.rename(f"{current.path}.bak")
@@ -51,6 +63,29 @@ def remove(context: Context, current: Migration, dependent: Migration | None, *,
         current.path.unlink()
 
 
+# CREATE/DROP guarded at the statement head, e.g. `CREATE UNIQUE INDEX IF NOT EXISTS`, a guard on a later
+# clause (`ALTER TABLE ... ADD COLUMN IF NOT EXISTS a, ADD COLUMN b`) does not make the statement idempotent.
+_IDEMPOTENT_RE = re.compile(
+    r"(?:\s*--[^\n]*\n)*\s*(?:CREATE|DROP)\s+(?:[A-Z]+\s+){1,3}?IF\s+(?:NOT\s+)?EXISTS\b",
+    re.IGNORECASE,
+)
+
+
+def _collapse_repeats(statements: t.Iterable[str]) -> list[str]:
+    """Drop idempotent statements that directly repeat the previous statement.
+
+    Only adjacent repeats within an identifier are dropped, a repeat after an
+    intervening statement (e.g. a DROP between two CREATE IF NOT EXISTS) is
+    kept.
+    """
+    collapsed: list[str] = []
+    for statement in statements:
+        if collapsed and statement == collapsed[-1] and _IDEMPOTENT_RE.match(statement):
+            continue
+        collapsed.append(statement)
+    return collapsed
+
+
 def write(
     apply_statements: dict[str, list[str]],
     rollback_statements: dict[str, list[list[str]]],
@@ -73,7 +108,7 @@ def write(
         if ident == "__data":
             continue
         apply.append(f"-- Squash {ident} statements.")
-        apply.extend(statements_)
+        apply.extend(_collapse_repeats(statements_))
 
     data_statements = apply_statements.get("__data", [])
     if data_statements:
@@ -84,15 +119,13 @@ def write(
     rollback_data_statements = rollback_statements.get("__data", [])
     if rollback_data_statements:
         rollback.append("-- Squash data statements.")
-        for data_statements in reversed(rollback_data_statements):
-            rollback.extend(reversed(data_statements))
+        rollback.extend(chain.from_iterable(map(reversed, reversed(rollback_data_statements))))
 
     for ident, statements_ in reversed(rollback_statements.items()):
         if ident == "__data":
             continue
         rollback.append(f"-- Squash {ident} statements.")
-        for migration_statements in reversed(statements_):
-            rollback.extend(reversed(migration_statements))
+        rollback.extend(_collapse_repeats(chain.from_iterable(map(reversed, reversed(statements_)))))
 
     content = template.format(
         message=message,
@@ -113,7 +146,56 @@ class ParsedStatement:
     identifier: str | None
 
 
+_NAME = r'(?:"[^"]+"|(?!(?:ONLY|IF|ON|CONCURRENTLY)\b)[A-Za-z_]\w*)'
+_TARGET = rf"(?:{_NAME}\.)?(?P<name>{_NAME})(?=[\s(;]|$)"
+_DDL_RE = re.compile(
+    r"""
+    (?P<type>CREATE|ALTER|DROP)\s+
+    (?:
+        (?P<index>(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+(?:NOT\s+)?EXISTS\s+)?)
+      | (?:TABLE|AGGREGATE|SCHEMA)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+_INDEX_ON_RE = re.compile(rf"{_NAME}\s+ON\s+{_TARGET}", re.IGNORECASE)
+_ON_RE = re.compile(r"\bON\b", re.IGNORECASE)
+_TARGET_RE = re.compile(_TARGET, re.IGNORECASE)
+
+
+def _parse_simple_ddl(statement: str) -> ParsedStatement | None:
+    """Extract the identifier from plain CREATE/ALTER/DROP statements without a full sqlparse parse."""
+    m = _DDL_RE.match(statement)
+    if m is None:
+        return None
+
+    if m["index"] is not None:
+        target = _INDEX_ON_RE.match(statement, m.end())
+        if target is None and _ON_RE.search(statement):
+            return None
+        target = target or _TARGET_RE.match(statement, m.end())
+    else:
+        target = _TARGET_RE.match(statement, m.end())
+
+    if target is None:
+        return None
+
+    name = target["name"]
+    if not name.startswith('"'):
+        # Reserved words are not valid identifiers, leave them to the full parse.
+        ttype, _ = next(sqlparse.lexer.tokenize(statement[target.start("name") :]))
+        if ttype not in sqlparse.tokens.Name:
+            return None
+
+    return ParsedStatement(statement, m["type"].upper(), name.strip('"'))
+
+
 def parse(context: Context, statement: str) -> ParsedStatement:
+    # -vvv output includes the sqlparse tokens, only skip the full parse when debug output is off.
+    parsed_ddl = _parse_simple_ddl(statement) if context.verbose <= Verbosity.verbose2 else None
+    if parsed_ddl is not None:
+        return parsed_ddl
+
     parsed = sqlparse.parse(statement)[0]
 
     type_ = parsed.get_type()
@@ -170,22 +252,31 @@ def parse(context: Context, statement: str) -> ParsedStatement:
 class ParseError(Exception): ...
 
 
+@functools.lru_cache(maxsize=256)
+def _parse_sqlglot(statement: str) -> tuple[str, str | None]:
+    """Parse a statement into its type and identifier, parsing is pure so results are cached."""
+    parsed = sqlglot.parse_one(statement, read="postgres", dialect="postgres")
+
+    identifier = None
+    if isinstance(parsed, (exp.Create, exp.Alter, exp.Drop)):
+        ident = parsed.find(exp.Table)
+        identifier = ident.name if ident.this is not None else str(ident).replace('"', "")
+
+    return parsed.__class__.__name__.upper(), identifier
+
+
 def parse_sqlglot(context: Context, statement: str) -> ParsedStatement:
     try:
-        parsed = sqlglot.parse_one(statement, read="postgres", dialect="postgres")
+        type_, identifier = _parse_sqlglot(statement)
     except sqlglot.errors.ParseError as e:
         r = r"(?P<msg>Expected table name but got) (<.*text: )?(?P<text>\w+)(, .*>)?\. Line (?P<line>\d+), Col: (?P<column>\d+)\.\n(?P<statement>.*)"
         m = re.match(r, str(e))
         msg = "{msg} {text}. Line: {line}, Column: {column}".format(**m.groupdict())
         raise ParseError(msg) from e
 
-    identifier = None
-    if isinstance(parsed, (exp.Create, exp.Alter, exp.Drop)):
-        ident = parsed.find(exp.Table)
-        identifier = ident.name if ident.this is not None else str(ident).replace('"', "")
-    elif isinstance(parsed, exp.Command):
+    if type_ == "COMMAND":
         # Unhandled syntax by sqlglot, fallback to sqlparse
         context.warning("sqlglot failed to parse, falling back to sqlparse.")
         return parse(context, statement)
 
-    return ParsedStatement(statement, parsed.__class__.__name__.upper(), identifier)
+    return ParsedStatement(statement, type_, identifier)
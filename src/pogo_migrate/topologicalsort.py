@@ -12,9 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
-from collections.abc import Collection, Iterable, Mapping
-from heapq import heappop, heappush
+from collections.abc import Collection, Iterable, Iterator, Mapping
+from heapq import heapify, heappop, heappush
 from typing import TypeVar
 
 
@@ -34,55 +33,93 @@ def topological_sort(
     items: Iterable[T],
     dependency_graph: Mapping[T, Collection[T]],
 ) -> Iterable[T]:
+    if not any(dependency_graph.values()):
+        # Nothing depends on anything, input order is already sorted.
+        yield from items
+        return
+
     # Tag each item with its input order
-    pqueue = list(enumerate(items))
-    ordering = {item: ix for ix, item in pqueue}
-    seen_since_last_change = 0
-    output: set[T] = set()
+    tagged = list(enumerate(items))
+    ordering = {item: ix for ix, item in tagged}
 
-    # Map blockers to the list of items they block
-    blocked_on: dict[T, set[T]] = defaultdict(set)
-    blocked: set[T] = set()
+    # Count each item's dependencies and map dependencies to the items they block,
+    # dependencies that are not in items are discarded.
+    indegree: dict[T, int] = {}
+    dependents: dict[T, list[T]] = {}
+    for n in ordering:
+        deps = [d for d in dependency_graph.get(n, []) if d in ordering]
+        indegree[n] = len(deps)
+        for d in deps:
+            dependents.setdefault(d, []).append(n)
 
-    while pqueue:
-        if seen_since_last_change == len(pqueue) + len(blocked):
-            raise_cycle_error(ordering, pqueue, blocked_on)
+    pqueue = [(ix, n) for ix, n in tagged if not indegree[n]]
+    heapify(pqueue)
 
+    while pqueue:
         _, n = heappop(pqueue)
+        yield n
+        for b in dependents.pop(n, ()):
+            indegree[b] -= 1
+            if not indegree[b]:
+                heappush(pqueue, (ordering[b], b))
 
-        blockers = {d for d in dependency_graph.get(n, []) if d not in output and d in ordering}
-        if not blockers:
-            seen_since_last_change = 0
-            output.add(n)
-            if n in blocked:
-                blocked.remove(n)
-            yield n
-            for b in blocked_on.pop(n, []):
-                if not any(b in other for other in blocked_on.values()):
-                    heappush(pqueue, (ordering[b], b))
-        elif n in blocked:
-            seen_since_last_change += 1
-        else:
-            seen_since_last_change = 0
-            blocked.add(n)
-            for b in blockers:
-                blocked_on[b].add(n)
-    if blocked_on:
-        raise_cycle_error(ordering, pqueue, blocked_on)
-
-
-def raise_cycle_error(ordering: dict[T, int], pqueue: list[tuple[int, T]], blocked_on: dict[T, set[T]]) -> None:
-    bad = next((item for item in blocked_on if item not in ordering), None)
-    if bad:
-        msg = f"Dependency graph contains a non-existent node {bad!r}"
-        raise ValueError(msg)
-    unresolved = {n for _, n in pqueue}
-    unresolved.update(*blocked_on.values())
+    unresolved = {n for n, d in indegree.items() if d}
     if unresolved:
-        msg = f"Dependency graph loop detected among {unresolved!r}"
-        raise CycleError(
-            msg,
-            sorted(unresolved, key=ordering.get),
-        )
-    msg = "raise_cycle_error called but no unresolved nodes exist"
-    raise AssertionError(msg)
+        # Items downstream of a loop are also unresolved, only report the loops.
+        residual = {n: [d for d in dependency_graph.get(n, []) if d in unresolved] for n in unresolved}
+        cycles = {
+            n
+            for component in strongly_connected_components(sorted(unresolved, key=ordering.__getitem__), residual)
+            if len(component) > 1 or component[0] in residual[component[0]]
+            for n in component
+        }
+        raise_cycle_error(ordering, cycles)
+
+
+def strongly_connected_components(nodes: Iterable[T], edges: Mapping[T, Collection[T]]) -> Iterable[list[T]]:  # noqa: C901
+    """Tarjan's algorithm, iterative to avoid the recursion limit on long chains."""
+    index: dict[T, int] = {}
+    lowlink: dict[T, int] = {}
+    stack: list[T] = []
+    on_stack: set[T] = set()
+
+    def visit(n: T) -> tuple[T, Iterator[T]]:
+        index[n] = lowlink[n] = len(index)
+        stack.append(n)
+        on_stack.add(n)
+        return n, iter(edges[n])
+
+    for root in nodes:
+        if root in index:
+            continue
+        work = [visit(root)]
+        while work:
+            n, successors = work[-1]
+            for m in successors:
+                if m not in index:
+                    work.append(visit(m))
+                    break
+                if m in on_stack:
+                    lowlink[n] = min(lowlink[n], index[m])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[n])
+                if lowlink[n] == index[n]:
+                    component = []
+                    while True:
+                        m = stack.pop()
+                        on_stack.discard(m)
+                        component.append(m)
+                        if m == n:
+                            break
+                    yield component
+
+
+def raise_cycle_error(ordering: dict[T, int], cycles: set[T]) -> None:
+    msg = f"Dependency graph loop detected among {cycles!r}"
+    raise CycleError(
+        msg,
+        sorted(cycles, key=ordering.__getitem__),
+    )
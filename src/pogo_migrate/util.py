@@ -1,9 +1,8 @@
+import base64
 import os
-import random
 import re
-import string
+import time
 import unicodedata
-from datetime import datetime, timezone
 from pathlib import Path
 
 from pogo_migrate.config import Config
@@ -13,30 +12,43 @@ def unidecode(s: str) -> str:
     """
     Return ``s`` with unicode diacritics removed.
     """
+    decomposed = unicodedata.normalize("NFD", s)
+    if decomposed.isascii():
+        return decomposed
     combining = unicodedata.combining
-    return "".join(c for c in unicodedata.normalize("NFD", s) if not combining(c))
+    return decomposed.translate({ord(c): None for c in set(decomposed) if combining(c)})
+
+
+_SLUG_INVALID_RE = re.compile(r"[^-a-z0-9]+")
+_SLUG_DASHES_RE = re.compile(r"-{2,}")
 
 
 def slugify(message: str) -> str:
     s = unidecode(message)
-    s = re.sub(r"[^-a-z0-9]+", "-", s.lower())
-    return re.sub(r"-{2,}", "-", s).strip("-")
+    s = _SLUG_INVALID_RE.sub("-", s.lower())
+    return _SLUG_DASHES_RE.sub("-", s).strip("-")
 
 
 def random_string() -> str:
     """Generate a random 5 digit string."""
-    return "".join(random.choices(string.digits + string.ascii_lowercase, k=5))  # noqa: S311
+    return base64.b32encode(os.urandom(4))[:5].decode().lower()
 
 
 def make_file(config: Config, message: str, extension: str) -> Path:
     slug = f"-{slugify(message)}" if message else ""
-    datestr = datetime.now(tz=timezone.utc).date().strftime("%Y%m%d")
+    now = time.gmtime()
+    datestr = f"{now.tm_year:04d}{now.tm_mon:02d}{now.tm_mday:02d}"
     rand = random_string()
 
-    current = max(
-        [int(p.name[len(datestr) + 1 :].split("_")[0]) for p in Path(config.migrations).glob(f"{datestr}_*")],
-        default=0,
-    )
+    prefix = f"{datestr}_"
+    try:
+        with os.scandir(config.migrations) as entries:
+            current = max(
+                (int(e.name[len(prefix) :].split("_", 1)[0]) for e in entries if e.name.startswith(prefix)),
+                default=0,
+            )
+    except FileNotFoundError:
+        current = 0
 
     number = str(int(current) + 1).zfill(2)
 
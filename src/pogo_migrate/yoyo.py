@@ -1,46 +1,60 @@
+from __future__ import annotations
+
 import re
-from pathlib import Path
+import typing as t
+
+if t.TYPE_CHECKING:
+    from pathlib import Path
+
+    import asyncpg
 
-import asyncpg
+    from pogo_migrate.context import Context
 
-from pogo_migrate.context import Context
+_HEADER_RE = re.compile(r".*--(.*)\s-- depends:(.*)\s")
+
+
+def _strip_header(content: str, m: re.Match | None = None) -> str:
+    """Remove the first yoyo header, reusing a match from the start of content when available."""
+    m = m or _HEADER_RE.search(content)
+    if m is None:
+        return content.strip()
+    return f"{content[: m.start()]}{content[m.end() :]}".strip()
 
 
 def convert_sql_migration(migration: Path) -> str:
-    with migration.open() as f:
-        apply_content = f.read()
+    apply_content = migration.read_text()
 
     rollback = migration.with_suffix(".rollback.sql")
-    rollback_content = ""
-    if rollback.exists():
-        with rollback.open() as f:
-            rollback_content = f.read()
+    try:
+        rollback_content = rollback.read_text()
+    except FileNotFoundError:
+        rollback_content = ""
+    else:
         rollback.unlink()
 
-    m = re.match(r".*--(.*)\s-- depends:(.*)\s", apply_content)
+    m = _HEADER_RE.match(apply_content)
 
     message, depends = "--", "-- depends:"
     if m:
         message = f"-- {m[1].strip()}"
         depends = f"-- depends: {m[2].strip()}"
 
-    content = [message, depends]
-
-    content.extend(["", "-- migrate: apply", ""])
-    apply_content = re.sub(r".*--(.*)\s-- depends:(.*)\s", "", apply_content)
-    content.append(apply_content.strip())
+    apply_body = _strip_header(apply_content, m)
+    rollback_body = _strip_header(rollback_content)
 
-    content.extend(["", "-- migrate: rollback", ""])
-    rollback_content = re.sub(r".*--(.*)\s-- depends:(.*)\s", "", rollback_content)
-    content.append(rollback_content.strip())
-
-    return "\n".join(content)
+    return f"{message}\n{depends}\n\n-- migrate: apply\n\n{apply_body}\n\n-- migrate: rollback\n\n{rollback_body}"
 
 
 async def copy_yoyo_migration_history(context: Context, db: asyncpg.Connection) -> None:
+    # Both preflight checks in one round trip, the insert can not be folded in
+    # as it would fail to plan when _yoyo_migration does not exist.
     stmt = """
-    SELECT count(*)
-    FROM _pogo_migration
+    SELECT
+        (SELECT count(*) FROM _pogo_migration) AS count,
+        EXISTS (
+           SELECT FROM information_schema.tables
+           WHERE   table_name   = '_yoyo_migration'
+        ) AS exists
     """
     r = await db.fetchrow(stmt)
 
@@ -48,13 +62,6 @@ async def copy_yoyo_migration_history(context: Context, db: asyncpg.Connection)
         context.warning("migration history exists, skipping yoyo migration.")
         return
 
-    stmt = """
-    SELECT EXISTS (
-       SELECT FROM information_schema.tables
-       WHERE   table_name   = '_yoyo_migration'
-    )"""
-    r = await db.fetchrow(stmt)
-
     if r is not None and not r["exists"]:
         context.warning("yoyo migration history missing, skipping yoyo migration.")
         return
@@ -5,10 +5,12 @@ import re
 import textwrap
 
 import asyncpg
+import click.testing
 import nest_asyncio
 import pytest
+import pytest_asyncio
 import rtoml
-import typer.testing
+import typer.main
 
 import pogo_migrate.cli
 from pogo_migrate import sql
@@ -34,10 +36,10 @@ def _clear_migration_tracking():
     except:  # noqa: E722, S110
         pass
     finally:
-        Migration._Migration__migrations = {}
+        Migration._Migration__migrations.clear()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def postgres_dsn():
     return os.environ["POSTGRES_DSN"]
 
@@ -53,24 +55,23 @@ def cwd(tmp_path):
         os.chdir(orig)
 
 
+PYPROJECT_TOML = rtoml.dumps(
+    {
+        "tool": {
+            "pogo": {
+                "migrations": "./migrations",
+                "database_config": "{POSTGRES_DSN}",
+            },
+        },
+    },
+).encode()
+
+
 @pytest.fixture
 def pyproject_factory(cwd):
     def factory():
         p = cwd / "pyproject.toml"
-
-        with p.open("w") as f:
-            f.write(
-                rtoml.dumps(
-                    {
-                        "tool": {
-                            "pogo": {
-                                "migrations": "./migrations",
-                                "database_config": "{POSTGRES_DSN}",
-                            },
-                        },
-                    },
-                ),
-            )
+        p.write_bytes(PYPROJECT_TOML)
 
     return factory
 
@@ -95,26 +96,56 @@ def migration_file_factory(migrations):
     return factory
 
 
-@pytest.fixture(autouse=True)
-async def db_session(postgres_dsn):
+@pytest.fixture
+def migration_files_factory(migrations):
+    def factory(*files):
+        paths = []
+        for mig_id, format_, contents in files:
+            p = migrations / f"{mig_id}.{format_}"
+            p.write_bytes(contents.encode())
+            paths.append(p)
+
+        return paths
+
+    return factory
+
+
+def pytest_collection_modifyitems(items):
+    # Async tests share the session event loop the database connection lives on.
+    marker = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if pytest_asyncio.is_async_test(item):
+            item.add_marker(marker, append=False)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def db_connection(postgres_dsn):
     conn = await asyncpg.connect(postgres_dsn)
-    tr = conn.transaction()
-    await tr.start()
-    await sql.ensure_pogo_sync(conn)
     try:
         yield conn
     finally:
-        await tr.rollback()
         await conn.close()
 
 
+@pytest_asyncio.fixture(autouse=True, loop_scope="session")
+async def db_session(db_connection):
+    tr = db_connection.transaction()
+    await tr.start()
+    await sql.ensure_pogo_sync(db_connection)
+    try:
+        yield db_connection
+    finally:
+        await tr.rollback()
+
+
 @pytest.fixture
 def context():
     return Context(0)
 
 
-class CliRunner(typer.testing.CliRunner):
-    target = pogo_migrate.cli.app
+class CliRunner(click.testing.CliRunner):
+    # typer's runner rebuilds the click command from the app on every invoke, build it once.
+    target = typer.main.get_command(pogo_migrate.cli.app)
     result = None
 
     def invoke(self, *args, **kwargs):
@@ -137,6 +168,6 @@ class CliRunner(typer.testing.CliRunner):
         assert self._clean_output(self.result.output) == self._clean_output(expected)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def cli_runner():
     return CliRunner()
@@ -1,20 +1,175 @@
 import importlib.metadata
+import os
+import types
 from pathlib import Path
 from textwrap import dedent
 from unittest import mock
 
 import pytest
+import pytest_asyncio
 
 from pogo_migrate import cli, sql
-from tests.util import AsyncMock
+from tests.util import AsyncMock, fetch_tables
+
+_PKG_VERSION = importlib.metadata.version("pogo-migrate")
+
+_EMPTY_MIGRATION = """
+-- commit
+-- depends:
+
+-- migrate: apply
+-- migrate: rollback
+"""
+
+_DEPENDS_ON_01_MIGRATION = """
+-- commit
+-- depends: 20210101_01_rando-commit
+
+-- migrate: apply
+-- migrate: rollback
+"""
+
+_DEPENDS_ON_02_MIGRATION = """
+-- commit
+-- depends: 20210101_02_rando-commit
+
+-- migrate: apply
+-- migrate: rollback
+"""
+
+_CREATE_TABLE_ONE_MIGRATION = """
+-- commit
+-- depends:
+
+-- migrate: apply
+CREATE TABLE table_one()
+-- migrate: rollback
+"""
+
+_CREATE_TABLE_TWO_MIGRATION = """
+-- commit
+-- depends: 20210101_01_rando-commit
+
+-- migrate: apply
+CREATE TABLE table_two()
+-- migrate: rollback
+"""
+
+_DROP_TABLE_ONE_MIGRATION = """
+-- commit
+-- depends:
+
+-- migrate: apply
+-- migrate: rollback
+DROP TABLE table_one;
+"""
+
+_YOYO_CREATE_TABLE_ONE = """
+-- commit
+-- depends:
+
+CREATE TABLE table_one();
+"""
+
+_YOYO_DROP_TABLE_ONE = """
+-- commit
+-- depends:
+DROP TABLE table_one;
+"""
+
+_YOYO_CREATE_TABLE_TWO = """
+-- commit2
+-- depends: 20210101_01_rando-commit
+CREATE TABLE table_two()
+"""
+
+_FIRST_MIGRATION = """
+-- commit
+-- depends:
+
+-- migrate: apply
+CREATE TABLE one (id INT);
+-- migrate: rollback
+DROP TABLE one;
+"""
+
+_SECOND_MIGRATION = """
+-- commit
+-- depends: 20210101_01_abcd-first-migration
+
+-- migrate: apply
+CREATE TABLE two (id INT);
+-- migrate: rollback
+DROP TABLE two;
+"""
+
+_PYPROJECT_DEFAULT = b"""\
+
+[tool.pogo]
+migrations = './migrations'
+database_config = '{POGO_DATABASE}'
+"""
+
+_PYPROJECT_MY_MIGRATIONS = b"""\
+
+[tool.pogo]
+migrations = './my-migrations'
+database_config = '{POSTGRES_DSN}'
+"""
+
+_NEW_MIGRATION = b"""\
+--
+-- depends:
+
+-- migrate: apply
+
+-- migrate: rollback
+
+"""
+
+_DUPLICATE_TABLE_ONE = b'DuplicateTableError: relation "table_one" already exists'
+_UNDEFINED_TABLE_ONE = b'UndefinedTableError: table "table_one" does not exist'
+
+
+def _noop_call(*_args, **_kwargs):
+    return 0
+
+
+class _FakeTempFile:
+    """Stand in for NamedTemporaryFile, the editor tests only need its name."""
+
+    def __init__(self, path):
+        self.name = str(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        return None
+
+    def write(self, content):
+        return len(content)
+
+
+def _listdir(directory):
+    with os.scandir(directory) as entries:
+        return sorted(entry.name for entry in entries)
+
+
+def _migration_ids(directory):
+    return sorted(stem for stem, ext in map(os.path.splitext, _listdir(directory)) if ext in {".py", ".sql"})
+
+
+def _lstat_side_effect(n):
+    # Each stat reports a later mtime, so every editor session registers as a change.
+    return [types.SimpleNamespace(st_mtime=i) for i in range(n)]
 
 
 def test_version(cli_runner):
-    version = importlib.metadata.version("pogo-migrate")
     result = cli_runner.invoke(["--version"])
     assert result.exit_code == 0
 
-    cli_runner.assert_output(f"pogo-migrate {version}")
+    cli_runner.assert_output(f"pogo-migrate {_PKG_VERSION}")
 
 
 @pytest.fixture
@@ -22,9 +177,14 @@ def pyproject(pyproject_factory, migrations):  # noqa: ARG001
     return pyproject_factory()
 
 
+@pytest.fixture(scope="module")
+def connect_mock(db_connection):
+    return AsyncMock(return_value=db_connection)
+
+
 @pytest.fixture(autouse=True)
-def _db_patch(db_session, monkeypatch):
-    monkeypatch.setattr(cli.sql.asyncpg, "connect", AsyncMock(return_value=db_session))
+def _db_patch(db_session, connect_mock, monkeypatch):  # noqa: ARG001
+    monkeypatch.setattr(cli.sql.asyncpg, "connect", connect_mock)
 
 
 class TestInit:
@@ -32,22 +192,14 @@ class TestInit:
         result = cli_runner.invoke(["init"], input="n\n")
         assert result.exit_code == 0, result.output
 
-        p = cwd / "pyproject.toml"
-        with p.open() as f:
-            assert f.read() == ""
+        assert not (cwd / "pyproject.toml").exists()
 
     def test_init_no_pyproject(self, cwd, cli_runner):
         result = cli_runner.invoke(["init"], input="y\n")
         assert result.exit_code == 0, result.output
 
         p = cwd / "pyproject.toml"
-        with p.open() as f:
-            assert f.read() == dedent("""\
-
-            [tool.pogo]
-            migrations = './migrations'
-            database_config = '{POGO_DATABASE}'
-            """)
+        assert p.read_bytes() == _PYPROJECT_DEFAULT
 
     def test_init_invalid_migrations_location(self, cwd, cli_runner):
         result = cli_runner.invoke(["init", "-m", str(cwd.parent / "migrations")])
@@ -68,40 +220,18 @@ class TestInit:
         result = cli_runner.invoke(["init"], input="y\n")
         assert result.exit_code == 0, result.output
 
-        with p.open() as f:
-            assert f.read() == dedent("""\
-            [tool.other]
-            key = "value"
-
-            [tool.pogo]
-            migrations = './migrations'
-            database_config = '{POGO_DATABASE}'
-            """)
+        assert p.read_bytes() == b'[tool.other]\nkey = "value"\n' + _PYPROJECT_DEFAULT
 
     def test_init_overrides(self, cwd, cli_runner):
         result = cli_runner.invoke(["init", "-m", "./my-migrations", "-d", "{POSTGRES_DSN}"], input="y\n")
         assert result.exit_code == 0, result.output
 
         p = cwd / "pyproject.toml"
-        with p.open() as f:
-            assert f.read() == dedent("""\
-
-            [tool.pogo]
-            migrations = './my-migrations'
-            database_config = '{POSTGRES_DSN}'
-            """)
+        assert p.read_bytes() == _PYPROJECT_MY_MIGRATIONS
 
     def test_init_already_configured(self, cwd, cli_runner):
         p = cwd / "pyproject.toml"
-        with p.open("w") as f:
-            assert f.write(
-                dedent("""\
-
-            [tool.pogo]
-            migrations = './my-migrations'
-            database_config = '{POSTGRES_DSN}'
-            """),
-            )
+        p.write_bytes(_PYPROJECT_MY_MIGRATIONS)
 
         result = cli_runner.invoke(["init"])
         assert result.exit_code == 1
@@ -109,26 +239,11 @@ class TestInit:
             dedent("pogo already configured."),
         )
 
-        p = cwd / "pyproject.toml"
-        with p.open() as f:
-            assert f.read() == dedent("""\
-
-            [tool.pogo]
-            migrations = './my-migrations'
-            database_config = '{POSTGRES_DSN}'
-            """)
+        assert p.read_bytes() == _PYPROJECT_MY_MIGRATIONS
 
     def test_init_already_configured_verbose(self, cwd, cli_runner):
         p = cwd / "pyproject.toml"
-        with p.open("w") as f:
-            assert f.write(
-                dedent("""\
-
-            [tool.pogo]
-            migrations = './my-migrations'
-            database_config = '{POSTGRES_DSN}'
-            """),
-            )
+        p.write_bytes(_PYPROJECT_MY_MIGRATIONS)
 
         result = cli_runner.invoke(["init", "-v"])
         assert result.exit_code == 1
@@ -158,16 +273,7 @@ class TestNew:
         result = cli_runner.invoke(["new", "--no-interactive"])
 
         assert result.exit_code == 0, result.output
-        with (cwd / "new_file.py").open() as f:
-            assert f.read() == dedent("""\
-            --
-            -- depends:
-
-            -- migrate: apply
-
-            -- migrate: rollback
-
-            """)
+        assert (cwd / "new_file.py").read_bytes() == _NEW_MIGRATION
 
     @pytest.mark.usefixtures("pyproject")
     def test_os_error(self, monkeypatch, cli_runner):
@@ -180,7 +286,7 @@ class TestNew:
 
     @pytest.mark.usefixtures("pyproject")
     def test_no_changes(self, monkeypatch, cli_runner):
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
+        monkeypatch.setattr(cli.subprocess, "call", _noop_call)
         result = cli_runner.invoke(["new"])
         assert result.exit_code == 1, result.output
         cli_runner.assert_output(
@@ -190,8 +296,8 @@ class TestNew:
     @pytest.mark.usefixtures("pyproject")
     def test_changes_made(self, monkeypatch, cli_runner, migrations):
         monkeypatch.setattr(cli, "make_file", mock.Mock(return_value=migrations / "new_file.sql"))
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock()]))
+        monkeypatch.setattr(cli.subprocess, "call", _noop_call)
+        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=_lstat_side_effect(2)))
 
         result = cli_runner.invoke(["new", "-v"])
 
@@ -206,12 +312,10 @@ class TestNew:
     def test_subprocess_call(self, monkeypatch, tmp_path, cli_runner):
         f = tmp_path / "tmpfile"
         f.touch()
-        mock_file = mock.MagicMock()
-        mock_file.name = str(f)
 
         monkeypatch.setenv("EDITOR", "vim")
         monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli, "NamedTemporaryFile", mock.Mock(return_value=mock_file))
+        monkeypatch.setattr(cli, "NamedTemporaryFile", lambda **_kwargs: _FakeTempFile(f))
 
         cli_runner.invoke(["new", "--py"])
 
@@ -221,12 +325,10 @@ class TestNew:
     def test_subprocess_call_dynamic_editor(self, monkeypatch, tmp_path, cli_runner):
         f = tmp_path / "tmpfile"
         f.touch()
-        mock_file = mock.MagicMock()
-        mock_file.name = str(f)
 
         monkeypatch.setenv("EDITOR", "vim {}")
         monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli, "NamedTemporaryFile", mock.Mock(return_value=mock_file))
+        monkeypatch.setattr(cli, "NamedTemporaryFile", lambda **_kwargs: _FakeTempFile(f))
 
         cli_runner.invoke(["new", "--py"])
 
@@ -235,118 +337,93 @@ class TestNew:
     @pytest.mark.usefixtures("pyproject")
     def test_file_written(self, monkeypatch, cli_runner, cwd):
         monkeypatch.setattr(cli, "make_file", mock.Mock(return_value=cwd / "new_file.py"))
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock()]))
+        monkeypatch.setattr(cli.subprocess, "call", _noop_call)
+        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=_lstat_side_effect(2)))
 
         result = cli_runner.invoke(["new"])
 
         assert result.exit_code == 0, result.output
-        with (cwd / "new_file.py").open() as f:
-            assert f.read() == dedent("""\
-            --
-            -- depends:
-
-            -- migrate: apply
-
-            -- migrate: rollback
-
-            """)
-
+        assert (cwd / "new_file.py").read_bytes() == _NEW_MIGRATION
+
+    @pytest.mark.parametrize(
+        ("user_input", "expected"),
+        [
+            pytest.param(
+                "q\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]: q
+                """,
+                id="quit",
+            ),
+            pytest.param(
+                "a\nb\nq\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]: a
+                Retry editing? [Ynqh]: b
+                Retry editing? [Ynqh]: q
+                """,
+                id="ignores-invalid-input",
+            ),
+            pytest.param(
+                "yn\nQ\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]: yn
+                Retry editing? [Ynqh]: Q
+                """,
+                id="ignores-partial-choice",
+            ),
+            pytest.param(
+                "h\nq\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]: h
+                y: reopen the migration file in your editor
+                n: save the migration as-is, without re-editing
+                q: quit without saving the migration
+                h: show this help
+
+                Retry editing? [Ynqh]: q
+                """,
+                id="help",
+            ),
+            pytest.param(
+                "y\nn\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]: y
+                Error loading migration.
+                Retry editing? [Ynqh]: n
+                Created file: new_file.py
+                """,
+                id="retry-and-exit",
+            ),
+            pytest.param(
+                "\nn\n",
+                """\
+                Error loading migration.
+                Retry editing? [Ynqh]:
+                Error loading migration.
+                Retry editing? [Ynqh]: n
+                Created file: new_file.py
+                """,
+                id="default-and-exit",
+            ),
+        ],
+    )
     @pytest.mark.usefixtures("pyproject")
-    def test_load_failed_quit(self, monkeypatch, cli_runner):
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock()]))
-        monkeypatch.setattr(cli.Migration, "load", mock.Mock(side_effect=Exception))
-
-        result = cli_runner.invoke(["new"], input="q\n")
-
-        assert result.exit_code == 0, result.output
-        cli_runner.assert_output(
-            dedent("""\
-            Error loading migration.
-            Retry editing? [Ynqh]: q
-            """),
-        )
-
-    @pytest.mark.usefixtures("pyproject")
-    def test_retry_ignores_invalid_input(self, monkeypatch, cli_runner):
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock()]))
-        monkeypatch.setattr(cli.Migration, "load", mock.Mock(side_effect=Exception))
-
-        result = cli_runner.invoke(["new"], input="a\nb\nq\n")
-
-        assert result.exit_code == 0, result.output
-        cli_runner.assert_output(
-            dedent("""\
-            Error loading migration.
-            Retry editing? [Ynqh]: a
-            Retry editing? [Ynqh]: b
-            Retry editing? [Ynqh]: q
-            """),
-        )
-
-    @pytest.mark.usefixtures("pyproject")
-    def test_retry_help(self, monkeypatch, cli_runner):
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock()]))
-        monkeypatch.setattr(cli.Migration, "load", mock.Mock(side_effect=Exception))
-
-        result = cli_runner.invoke(["new"], input="h\nq\n")
-
-        assert result.exit_code == 0, result.output
-        cli_runner.assert_output(
-            dedent("""\
-            Error loading migration.
-            Retry editing? [Ynqh]: h
-            y: reopen the migration file in your editor
-            n: save the migration as-is, without re-editing
-            q: quit without saving the migration
-            h: show this help
-
-            Retry editing? [Ynqh]: q
-            """),
-        )
-
-    @pytest.mark.usefixtures("pyproject")
-    def test_load_failed_retry_and_exit(self, monkeypatch, cli_runner, cwd):
+    def test_load_failed_prompt(self, monkeypatch, cli_runner, cwd, user_input, expected):
         monkeypatch.setattr(cli, "make_file", mock.Mock(return_value=cwd / "new_file.py"))
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock(), mock.Mock()]))
+        monkeypatch.setattr(cli.subprocess, "call", _noop_call)
+        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=_lstat_side_effect(3)))
         monkeypatch.setattr(cli.Migration, "load", mock.Mock(side_effect=Exception))
 
-        result = cli_runner.invoke(["new"], input="y\nn\n")
+        result = cli_runner.invoke(["new"], input=user_input)
 
         assert result.exit_code == 0, result.output
-        cli_runner.assert_output(
-            dedent("""\
-            Error loading migration.
-            Retry editing? [Ynqh]: y
-            Error loading migration.
-            Retry editing? [Ynqh]: n
-            Created file: new_file.py
-            """),
-        )
-
-    @pytest.mark.usefixtures("pyproject")
-    def test_load_failed_default_and_exit(self, monkeypatch, cli_runner, cwd):
-        monkeypatch.setattr(cli, "make_file", mock.Mock(return_value=cwd / "new_file.py"))
-        monkeypatch.setattr(cli.subprocess, "call", mock.Mock())
-        monkeypatch.setattr(cli.Path, "lstat", mock.Mock(side_effect=[mock.Mock(), mock.Mock(), mock.Mock()]))
-        monkeypatch.setattr(cli.Migration, "load", mock.Mock(side_effect=Exception))
-
-        result = cli_runner.invoke(["new"], input="\nn\n")
-
-        assert result.exit_code == 0, result.output
-        cli_runner.assert_output(
-            dedent("""\
-            Error loading migration.
-            Retry editing? [Ynqh]:
-            Error loading migration.
-            Retry editing? [Ynqh]: n
-            Created file: new_file.py
-            """),
-        )
+        cli_runner.assert_output(expected)
 
 
 class TestHistory:
@@ -362,28 +439,10 @@ class TestHistory:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    def test_migrations_nono_config(self, migration_file_factory, cli_runner):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+    def test_migrations_nono_config(self, migration_files_factory, cli_runner):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _EMPTY_MIGRATION),
         )
         result = cli_runner.invoke(["history"])
         assert result.exit_code == 0, result.output
@@ -397,29 +456,11 @@ class TestHistory:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    def test_migrations_not_applied(self, migration_file_factory, cli_runner, monkeypatch):
+    def test_migrations_not_applied(self, migration_files_factory, cli_runner, monkeypatch):
         monkeypatch.delenv("POSTGRES_DSN")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _EMPTY_MIGRATION),
         )
         result = cli_runner.invoke(["history", "-v"])
         assert result.exit_code == 0, result.output
@@ -434,29 +475,11 @@ class TestHistory:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_migrations_partial_applied(self, cli_runner, migration_file_factory, db_session):
+    async def test_migrations_partial_applied(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
         )
         result = cli_runner.invoke(["history"])
         assert result.exit_code == 0, result.output
@@ -470,29 +493,11 @@ class TestHistory:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_migrations_partial_applied_only_unapplied(self, cli_runner, migration_file_factory, db_session):
+    async def test_migrations_partial_applied_only_unapplied(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
         )
         result = cli_runner.invoke(["history", "--unapplied"])
         assert result.exit_code == 0, result.output
@@ -505,29 +510,11 @@ class TestHistory:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_migrations_partial_applied_unapplied_simple(self, cli_runner, migration_file_factory, db_session):
+    async def test_migrations_partial_applied_unapplied_simple(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
         )
         result = cli_runner.invoke(["history", "--unapplied", "--simple"])
         assert result.exit_code == 0, result.output
@@ -540,41 +527,13 @@ class TestHistory:
 
 class TestApply:
     async def assert_tables(self, db_session, tables):
-        stmt = """
-        SELECT tablename
-        FROM pg_tables
-        WHERE  schemaname = 'public'
-        ORDER BY tablename
-        """
-        results = await db_session.fetch(stmt)
-
-        assert [r["tablename"] for r in results if not r["tablename"].startswith("_pogo")] == tables
+        assert [t for t in await fetch_tables(db_session) if not t.startswith("_pogo")] == tables
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_apply_success(self, cli_runner, migration_file_factory, db_session):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE table_one()
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            CREATE TABLE table_two()
-            -- migrate: rollback
-            """),
+    async def test_apply_success(self, cli_runner, migration_files_factory, db_session):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _CREATE_TABLE_ONE_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _CREATE_TABLE_TWO_MIGRATION),
         )
         result = cli_runner.invoke(["apply", "-v"])
         assert result.exit_code == 0, result.output
@@ -587,30 +546,21 @@ class TestApply:
         await self.assert_tables(db_session, ["table_one", "table_two"])
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_apply_failure(self, cli_runner, migration_file_factory, db_session):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE table_one()
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            CREATE TABLE table_two
-            -- migrate: rollback
-            """),
+    async def test_apply_failure(self, cli_runner, migration_files_factory, db_session):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _CREATE_TABLE_ONE_MIGRATION),
+            (
+                "20210101_02_rando-commit",
+                "sql",
+                dedent("""
+                -- commit
+                -- depends: 20210101_01_rando-commit
+
+                -- migrate: apply
+                CREATE TABLE table_two
+                -- migrate: rollback
+                """),
+            ),
         )
         result = cli_runner.invoke(["apply", "-v"])
         assert result.exit_code == 1, result.output
@@ -625,76 +575,52 @@ class TestApply:
         await self.assert_tables(db_session, ["table_one"])
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    def test_apply_failure_verbose(self, cli_runner, migration_file_factory):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE table_one()
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            CREATE TABLE table_one()
-            -- migrate: rollback
-            """),
+    def test_apply_failure_verbose(self, cli_runner, migration_files_factory):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _CREATE_TABLE_ONE_MIGRATION),
+            (
+                "20210101_02_rando-commit",
+                "sql",
+                dedent("""
+                -- commit
+                -- depends: 20210101_01_rando-commit
+
+                -- migrate: apply
+                CREATE TABLE table_one()
+                -- migrate: rollback
+                """),
+            ),
         )
         result = cli_runner.invoke(["apply", "-vvv"])
         assert result.exit_code == 1, result.output
-        assert 'DuplicateTableError: relation "table_one" already exists' in result.output
+        assert _DUPLICATE_TABLE_ONE in result.stdout_bytes
 
 
 class TestRollback:
     async def assert_tables(self, db_session, tables):
-        stmt = """
-        SELECT tablename
-        FROM pg_tables
-        WHERE  schemaname = 'public'
-        ORDER BY tablename
-        """
-        results = await db_session.fetch(stmt)
-
-        assert [r["tablename"] for r in results if not r["tablename"].startswith("_pogo")] == tables
+        assert [t for t in await fetch_tables(db_session) if not t.startswith("_pogo")] == tables
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_rollback_success(self, cli_runner, migration_file_factory, db_session):
-        await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        await sql.migration_applied(db_session, "20210101_02_rando-commit", "hash2")
-        await db_session.execute("create table table_one();create table table_two()")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            DROP TABLE table_one;
-            """),
+    async def test_rollback_success(self, cli_runner, migration_files_factory, db_session):
+        await sql.migrations_applied(
+            db_session,
+            [("20210101_01_rando-commit", "hash"), ("20210101_02_rando-commit", "hash2")],
         )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            DROP TABLE table_two;
-            """),
+        await db_session.execute("create table table_one();create table table_two()")
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _DROP_TABLE_ONE_MIGRATION),
+            (
+                "20210101_02_rando-commit",
+                "sql",
+                dedent("""
+                -- commit
+                -- depends: 20210101_01_rando-commit
+
+                -- migrate: apply
+                -- migrate: rollback
+                DROP TABLE table_two;
+                """),
+            ),
         )
         result = cli_runner.invoke(["rollback", "--count", "-1", "-v"])
         assert result.exit_code == 0, result.output
@@ -741,79 +667,54 @@ class TestRollback:
         migration_file_factory(
             "20210101_01_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            DROP TABLE table_one;
-            """),
+            _DROP_TABLE_ONE_MIGRATION,
         )
         result = cli_runner.invoke(["rollback", "-vvv"])
         assert result.exit_code == 1, result.output
-        assert 'UndefinedTableError: table "table_one" does not exist' in result.output
+        assert _UNDEFINED_TABLE_ONE in result.stdout_bytes
 
 
-class TestValidate:
-    @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_validate_clean(self, cli_runner, migration_file_factory):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE table_one()
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            CREATE TABLE table_two()
-            -- migrate: rollback
-            """),
-        )
-        result = cli_runner.invoke(["validate", "-v"])
-        assert result.exit_code == 0, result.output
-        cli_runner.assert_output("")
-
-    @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_validate_invalid_sql(self, cli_runner, migration_file_factory):
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE table_one();
-            -- migrate: rollback
-            DROP TABLE;
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            CREATE INDEX foo;
-            -- migrate: rollback
-            DROP INDEX;
-            DROP AGGREGATE lock;
-            """),
+class TestValidate:
+    @pytest.mark.usefixtures("migrations", "pyproject")
+    async def test_validate_clean(self, cli_runner, migration_files_factory):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _CREATE_TABLE_ONE_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _CREATE_TABLE_TWO_MIGRATION),
+        )
+        result = cli_runner.invoke(["validate", "-v"])
+        assert result.exit_code == 0, result.output
+        cli_runner.assert_output("")
+
+    @pytest.mark.usefixtures("migrations", "pyproject")
+    async def test_validate_invalid_sql(self, cli_runner, migration_files_factory):
+        migration_files_factory(
+            (
+                "20210101_01_rando-commit",
+                "sql",
+                dedent("""
+                -- commit
+                -- depends:
+
+                -- migrate: apply
+                CREATE TABLE table_one();
+                -- migrate: rollback
+                DROP TABLE;
+                """),
+            ),
+            (
+                "20210101_02_rando-commit",
+                "sql",
+                dedent("""
+                -- commit
+                -- depends: 20210101_01_rando-commit
+
+                -- migrate: apply
+                CREATE INDEX foo;
+                -- migrate: rollback
+                DROP INDEX;
+                DROP AGGREGATE lock;
+                """),
+            ),
         )
         result = cli_runner.invoke(["validate", "-v"])
         assert result.exit_code == 0, result.output
@@ -935,40 +836,12 @@ class TestMark:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_mark_migrations_applied(self, cli_runner, migration_file_factory, db_session):
+    async def test_mark_migrations_applied(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_03_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
+            ("20210101_03_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
         )
         result = cli_runner.invoke(["mark"], input="y\nn\n")
         assert result.exit_code == 0, result.output
@@ -982,40 +855,12 @@ class TestMark:
         assert applied_migrations == {"20210101_01_rando-commit", "20210101_02_rando-commit"}
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_mark_migration_applied(self, cli_runner, migration_file_factory, db_session):
+    async def test_mark_migration_applied(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_03_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
+            ("20210101_03_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
         )
         result = cli_runner.invoke(["mark", "-m", "20210101_02_rando-commit"], input="y\n")
         assert result.exit_code == 0, result.output
@@ -1028,40 +873,12 @@ class TestMark:
         assert applied_migrations == {"20210101_01_rando-commit", "20210101_02_rando-commit"}
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_mark_migrations_non_interactive(self, cli_runner, migration_file_factory, db_session):
+    async def test_mark_migrations_non_interactive(self, cli_runner, migration_files_factory, db_session):
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_03_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
+            ("20210101_03_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
         )
         result = cli_runner.invoke(["mark", "--no-interactive"])
         assert result.exit_code == 0, result.output
@@ -1086,41 +903,15 @@ class TestUnMark:
         )
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_unmark_migrations(self, cli_runner, migration_file_factory, db_session):
-        await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        await sql.migration_applied(db_session, "20210101_02_rando-commit", "hash2")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+    async def test_unmark_migrations(self, cli_runner, migration_files_factory, db_session):
+        await sql.migrations_applied(
+            db_session,
+            [("20210101_01_rando-commit", "hash"), ("20210101_02_rando-commit", "hash2")],
         )
-        migration_file_factory(
-            "20210101_03_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
+            ("20210101_03_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
         )
         result = cli_runner.invoke(["unmark"], input="y\nn\n")
         assert result.exit_code == 0, result.output
@@ -1134,41 +925,15 @@ class TestUnMark:
         assert applied_migrations == {"20210101_01_rando-commit"}
 
     @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_unmark_migration(self, cli_runner, migration_file_factory, db_session):
-        await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
-        await sql.migration_applied(db_session, "20210101_02_rando-commit", "hash2")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+    async def test_unmark_migration(self, cli_runner, migration_files_factory, db_session):
+        await sql.migrations_applied(
+            db_session,
+            [("20210101_01_rando-commit", "hash"), ("20210101_02_rando-commit", "hash2")],
         )
-        migration_file_factory(
-            "20210101_03_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _EMPTY_MIGRATION),
+            ("20210101_02_rando-commit", "sql", _DEPENDS_ON_01_MIGRATION),
+            ("20210101_03_rando-commit", "sql", _DEPENDS_ON_02_MIGRATION),
         )
         result = cli_runner.invoke(["unmark", "-m", "20210101_02_rando-commit"], input="y\n")
         assert result.exit_code == 0, result.output
@@ -1181,42 +946,27 @@ class TestUnMark:
         assert applied_migrations == {"20210101_01_rando-commit"}
 
 
-class TestMigrateYoyo:
-    @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_skip_files(self, migration_file_factory, cli_runner, db_session):
-        await db_session.execute("""
-        create table _yoyo_migration (
-            migration_hash varchar(64),
-            migration_id varchar(255),
-            applied_at_utc timestamp
-        );""")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
+@pytest_asyncio.fixture(loop_scope="session")
+async def yoyo_table(db_session):
+    await db_session.execute("""
+    create table _yoyo_migration (
+        migration_hash varchar(64),
+        migration_id varchar(255),
+        applied_at_utc timestamp
+    );""")
 
-            CREATE TABLE table_one();
-            """),
-        )
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "rollback.sql",
-            dedent("""
-            -- commit
-            -- depends:
-            DROP TABLE table_one;
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit2",
-            "sql",
-            dedent("""
-            -- commit2
-            -- depends: 20210101_01_rando-commit
-            CREATE TABLE table_two()
-            """),
+
+class TestMigrateYoyo:
+    @pytest.mark.usefixtures("migrations", "pyproject", "yoyo_table")
+    async def test_skip_files(self, migration_files_factory, cli_runner):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _YOYO_CREATE_TABLE_ONE),
+            (
+                "20210101_01_rando-commit",
+                "rollback.sql",
+                _YOYO_DROP_TABLE_ONE,
+            ),
+            ("20210101_02_rando-commit2", "sql", _YOYO_CREATE_TABLE_TWO),
         )
 
         result = cli_runner.invoke(["migrate-yoyo", "--skip-files", "-vvv"])
@@ -1227,14 +977,8 @@ class TestMigrateYoyo:
             """),
         )
 
-    @pytest.mark.usefixtures("migrations", "pyproject")
+    @pytest.mark.usefixtures("migrations", "pyproject", "yoyo_table")
     async def test_history_already_loaded(self, cli_runner, db_session):
-        await db_session.execute("""
-        create table _yoyo_migration (
-            migration_hash varchar(64),
-            migration_id varchar(255),
-            applied_at_utc timestamp
-        );""")
         await sql.migration_applied(db_session, "20210101_01_rando-commit", "hash")
 
         result = cli_runner.invoke(["migrate-yoyo", "-vvv"])
@@ -1255,41 +999,16 @@ class TestMigrateYoyo:
             """),
         )
 
-    @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_sql_files_converted(self, migration_file_factory, cli_runner, db_session):
-        await db_session.execute("""
-        create table _yoyo_migration (
-            migration_hash varchar(64),
-            migration_id varchar(255),
-            applied_at_utc timestamp
-        );""")
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            CREATE TABLE table_one();
-            """),
-        )
-        migration_file_factory(
-            "20210101_01_rando-commit",
-            "rollback.sql",
-            dedent("""
-            -- commit
-            -- depends:
-            DROP TABLE table_one;
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_rando-commit2",
-            "sql",
-            dedent("""
-            -- commit2
-            -- depends: 20210101_01_rando-commit
-            CREATE TABLE table_two()
-            """),
+    @pytest.mark.usefixtures("migrations", "pyproject", "yoyo_table")
+    async def test_sql_files_converted(self, migration_files_factory, cli_runner):
+        migration_files_factory(
+            ("20210101_01_rando-commit", "sql", _YOYO_CREATE_TABLE_ONE),
+            (
+                "20210101_01_rando-commit",
+                "rollback.sql",
+                _YOYO_DROP_TABLE_ONE,
+            ),
+            ("20210101_02_rando-commit2", "sql", _YOYO_CREATE_TABLE_TWO),
         )
 
         result = cli_runner.invoke(["migrate-yoyo"])
@@ -1301,14 +1020,8 @@ class TestMigrateYoyo:
             """),
         )
 
-    @pytest.mark.usefixtures("migrations", "pyproject")
-    async def test_py_files_skipped(self, migration_file_factory, cli_runner, db_session):
-        await db_session.execute("""
-        create table _yoyo_migration (
-            migration_hash varchar(64),
-            migration_id varchar(255),
-            applied_at_utc timestamp
-        );""")
+    @pytest.mark.usefixtures("migrations", "pyproject", "yoyo_table")
+    async def test_py_files_skipped(self, migration_file_factory, cli_runner):
         migration_file_factory(
             "20210101_01_rando-commit",
             "py",
@@ -1329,24 +1042,12 @@ class TestRemove:
         migration_file_factory(
             "20210101_01_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            _DEPENDS_ON_02_MIGRATION,
         )
         mp = migration_file_factory(
             "20210101_02_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            _EMPTY_MIGRATION,
         )
 
         result = cli_runner.invoke(["remove", "20210101_02_rando"])
@@ -1358,24 +1059,12 @@ class TestRemove:
         migration_file_factory(
             "20210101_01_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            _DEPENDS_ON_02_MIGRATION,
         )
         mp = migration_file_factory(
             "20210101_02_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            _EMPTY_MIGRATION,
         )
 
         result = cli_runner.invoke(["remove", "20210101_02_rando", "--backup"])
@@ -1389,145 +1078,128 @@ class TestClean:
     def test_bak_files_removed(self, migration_file_factory, cli_runner):
         b1 = migration_file_factory(
             "20210101_01_rando-commit",
-            "sql.bak",
-            dedent("""
-            -- commit
-            -- depends: 20210101_02_rando-commit
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
-        )
-        b2 = migration_file_factory(
-            "20210101_02_rando-commit",
-            "sql.bak",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            "sql.bak",
+            _DEPENDS_ON_02_MIGRATION,
+        )
+        b2 = migration_file_factory(
+            "20210101_02_rando-commit",
+            "sql.bak",
+            _EMPTY_MIGRATION,
         )
         mp = migration_file_factory(
             "20210101_02_rando-commit",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            """),
+            _EMPTY_MIGRATION,
         )
 
         result = cli_runner.invoke(["clean"])
         assert result.exit_code == 0, result.output
 
-        assert b1.exists() is False
-        assert b2.exists() is False
-        assert mp.exists() is True
+        names = _listdir(mp.parent)
+        assert b1.name not in names
+        assert b2.name not in names
+        assert mp.name in names
 
 
-class TestSquash:
-    def test_simple_squash_all_sql(self, migration_file_factory, cli_runner):
-        old = migration_file_factory(
-            "20210101_01_abcd-first-migration",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
+_EXPECTED_SIMPLE_SQUASH = """\
+-- commit
+-- depends:
 
-            -- migrate: apply
-            CREATE TABLE one (id INT);
-            INSERT INTO one (id) VALUES (1);
-            -- migrate: rollback
-            DELETE FROM one;
-            DROP TABLE one;
-            """),
-        )
-        new = migration_file_factory(
-            "20210101_02_efgh-second-migration",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_abcd-first-migration
+-- squashed: 20210101_01_abcd-first-migration
 
-            -- migrate: apply
-            CREATE TABLE two (id INT);
-            UPDATE one SET id = 2;
-            -- migrate: rollback
-            UPDATE one SET id = 1;
-            DROP TABLE two;
-            """),
-        )
+-- migrate: apply
 
-        result = cli_runner.invoke(["squash", "-vvv"])
-        assert result.exit_code == 0, result.output
+-- Squash one statements.
 
-        assert old.exists() is False
-        assert new.read_text() == dedent("""\
-        -- commit
-        -- depends:
+CREATE TABLE one (id INT);
 
-        -- squashed: 20210101_01_abcd-first-migration
+-- Squash two statements.
 
-        -- migrate: apply
+CREATE TABLE two (id INT);
 
-        -- Squash one statements.
+-- Squash data statements.
 
-        CREATE TABLE one (id INT);
+INSERT INTO one (id) VALUES (1);
 
-        -- Squash two statements.
+UPDATE one SET id = 2;
 
-        CREATE TABLE two (id INT);
+-- migrate: rollback
 
-        -- Squash data statements.
+-- Squash data statements.
 
-        INSERT INTO one (id) VALUES (1);
+UPDATE one SET id = 1;
 
-        UPDATE one SET id = 2;
+DELETE FROM one;
 
-        -- migrate: rollback
+-- Squash two statements.
 
-        -- Squash data statements.
+DROP TABLE two;
 
-        UPDATE one SET id = 1;
+-- Squash one statements.
 
-        DELETE FROM one;
+DROP TABLE one;
+"""
 
-        -- Squash two statements.
 
-        DROP TABLE two;
+_EXPECTED_PARTIAL_SQUASH = """\
+-- fourth migration
+-- depends: 20210101_02_efgh-second-migration
 
-        -- Squash one statements.
+-- squashed: 20210101_03_ijkl-third-migration
 
-        DROP TABLE one;
-        """)
+-- migrate: apply
 
-    def test_apply_sqlglot_reserved_keyword_names_errors_trapped(self, migration_file_factory, cli_runner):
-        migration_file_factory(
-            "20210101_01_abcd-first-migration",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
+-- Squash three statements.
 
-            -- migrate: apply
-            CREATE TABLE lock (id INT);
-            -- migrate: rollback
-            """),
-        )
+CREATE TABLE three (id INT);
 
-        result = cli_runner.invoke(["squash"])
-        assert result.exit_code == 1, result.output
+-- Squash four statements.
 
-        cli_runner.assert_output(
-            "20210101_01_abcd-first-migration: Expected table name but got lock. Line: 1, Column: 17",
-        )
+CREATE TABLE four (id INT);
 
-    def test_apply_reserved_keyword_names_errors_trapped(self, migration_file_factory, cli_runner):
-        migration_file_factory(
+-- migrate: rollback
+
+-- Squash four statements.
+
+DROP TABLE four;
+
+-- Squash three statements.
+
+DROP TABLE three;
+"""
+
+
+_EXPECTED_SOURCES_TRACKED = """\
+-- commit
+-- depends:
+
+-- squashed: 20210101_01_abcd-first-migration
+
+-- migrate: apply
+
+-- Squash one statements.
+
+CREATE TABLE one (id INT); -- source: 20210101_01_abcd-first-migration
+
+-- Squash two statements.
+
+CREATE TABLE two (id INT); -- source: 20210101_02_efgh-second-migration
+
+-- migrate: rollback
+
+-- Squash two statements.
+
+DROP TABLE two; -- source: 20210101_02_efgh-second-migration
+
+-- Squash one statements.
+
+DROP TABLE one; -- source: 20210101_01_abcd-first-migration
+"""
+
+
+class TestSquash:
+    def test_simple_squash_all_sql(self, migration_file_factory, cli_runner):
+        old = migration_file_factory(
             "20210101_01_abcd-first-migration",
             "sql",
             dedent("""
@@ -1535,59 +1207,75 @@ class TestSquash:
             -- depends:
 
             -- migrate: apply
-            DROP AGGREGATE lock;
+            CREATE TABLE one (id INT);
+            INSERT INTO one (id) VALUES (1);
             -- migrate: rollback
+            DELETE FROM one;
+            DROP TABLE one;
             """),
         )
-
-        result = cli_runner.invoke(["squash"])
-        assert result.exit_code == 1, result.output
-
-        cli_runner.assert_output(
-            "Can not extract table from DDL statement in migration 20210101_01_abcd-first-migration",
-        )
-
-    def test_rollback_sqlglot_reserved_keyword_names_errors_trapped(self, migration_file_factory, cli_runner):
-        migration_file_factory(
-            "20210101_01_abcd-first-migration",
+        new = migration_file_factory(
+            "20210101_02_efgh-second-migration",
             "sql",
             dedent("""
             -- commit
-            -- depends:
+            -- depends: 20210101_01_abcd-first-migration
 
             -- migrate: apply
+            CREATE TABLE two (id INT);
+            UPDATE one SET id = 2;
             -- migrate: rollback
-            CREATE TABLE lock;
+            UPDATE one SET id = 1;
+            DROP TABLE two;
             """),
         )
 
-        result = cli_runner.invoke(["squash"])
-        assert result.exit_code == 1, result.output
-
-        cli_runner.assert_output(
-            "20210101_01_abcd-first-migration: Expected table name but got lock. Line: 1, Column: 17",
-        )
+        result = cli_runner.invoke(["squash", "-vvv"])
+        assert result.exit_code == 0, result.output
 
-    def test_rollback_reserved_keyword_names_errors_trapped(self, migration_file_factory, cli_runner):
+        assert old.exists() is False
+        assert new.read_text() == _EXPECTED_SIMPLE_SQUASH
+
+    @pytest.mark.parametrize(
+        ("apply", "rollback", "expected"),
+        [
+            pytest.param(
+                "CREATE TABLE lock (id INT);",
+                "",
+                "20210101_01_abcd-first-migration: Expected table name but got lock. Line: 1, Column: 17",
+                id="apply-sqlglot",
+            ),
+            pytest.param(
+                "DROP AGGREGATE lock;",
+                "",
+                "Can not extract table from DDL statement in migration 20210101_01_abcd-first-migration",
+                id="apply-sqlparse",
+            ),
+            pytest.param(
+                "",
+                "CREATE TABLE lock;",
+                "20210101_01_abcd-first-migration: Expected table name but got lock. Line: 1, Column: 17",
+                id="rollback-sqlglot",
+            ),
+            pytest.param(
+                "",
+                "CREATE AGGREGATE lock;",
+                "Can not extract table from DDL statement in migration 20210101_01_abcd-first-migration",
+                id="rollback-sqlparse",
+            ),
+        ],
+    )
+    def test_reserved_keyword_names_errors_trapped(self, migration_file_factory, cli_runner, apply, rollback, expected):
         migration_file_factory(
             "20210101_01_abcd-first-migration",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            -- migrate: rollback
-            CREATE AGGREGATE lock;
-            """),
+            f"-- commit\n-- depends:\n\n-- migrate: apply\n{apply}\n-- migrate: rollback\n{rollback}\n",
         )
 
         result = cli_runner.invoke(["squash"])
         assert result.exit_code == 1, result.output
 
-        cli_runner.assert_output(
-            "Can not extract table from DDL statement in migration 20210101_01_abcd-first-migration",
-        )
+        cli_runner.assert_output(expected)
 
     def test_prompt_update(self, migration_file_factory, cli_runner):
         migration_file_factory(
@@ -1653,50 +1341,58 @@ class TestSquash:
         DROP TABLE one;
         """)
 
-    def test_python_and_non_transaction_skipped(self, migration_file_factory, cli_runner, migrations):
-        migration_file_factory(
-            "20210101_01_abcd-first-migration",
-            "sql",
-            dedent("""
-            -- first migration
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE one (id INT);
-
-            -- migrate: rollback
-            DROP TABLE one;
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_efgh-second-migration",
-            "py",
-            dedent('''
-            """
-            second migration
-            """
-            __depends__ = ["20210101_01_abcd-first-migration"]
-            __transaction__ = False
-
-            async def apply(db):
-                await db.execute("CREATE TABLE two();")
-
-            async def rollback(db):
-                await db.execute("DROP TABLE two;")
-            '''),
-        )
-        migration_file_factory(
-            "20210101_03_ijkl-third-migration",
-            "sql",
-            dedent("""
-            -- third migration
-            -- depends: 20210101_02_efgh-second-migration
-
-            -- migrate: apply
-            CREATE TABLE three (id INT);
-            -- migrate: rollback
-            DROP TABLE three;
-            """),
+    def test_python_and_non_transaction_skipped(
+        self,
+        migration_file_factory,
+        migration_files_factory,
+        cli_runner,
+        migrations,
+    ):
+        migration_files_factory(
+            (
+                "20210101_01_abcd-first-migration",
+                "sql",
+                dedent("""
+                -- first migration
+                -- depends:
+
+                -- migrate: apply
+                CREATE TABLE one (id INT);
+
+                -- migrate: rollback
+                DROP TABLE one;
+                """),
+            ),
+            (
+                "20210101_02_efgh-second-migration",
+                "py",
+                dedent('''
+                """
+                second migration
+                """
+                __depends__ = ["20210101_01_abcd-first-migration"]
+                __transaction__ = False
+
+                async def apply(db):
+                    await db.execute("CREATE TABLE two();")
+
+                async def rollback(db):
+                    await db.execute("DROP TABLE two;")
+                '''),
+            ),
+            (
+                "20210101_03_ijkl-third-migration",
+                "sql",
+                dedent("""
+                -- third migration
+                -- depends: 20210101_02_efgh-second-migration
+
+                -- migrate: apply
+                CREATE TABLE three (id INT);
+                -- migrate: rollback
+                DROP TABLE three;
+                """),
+            ),
         )
         new = migration_file_factory(
             "20210101_04_mnop-fourth-migration",
@@ -1730,34 +1426,9 @@ class TestSquash:
         result = cli_runner.invoke(["squash"])
         assert result.exit_code == 0, result.output
 
-        assert new.read_text() == dedent("""\
-        -- fourth migration
-        -- depends: 20210101_02_efgh-second-migration
-
-        -- squashed: 20210101_03_ijkl-third-migration
-
-        -- migrate: apply
-
-        -- Squash three statements.
-
-        CREATE TABLE three (id INT);
-
-        -- Squash four statements.
-
-        CREATE TABLE four (id INT);
+        assert new.read_text() == _EXPECTED_PARTIAL_SQUASH
 
-        -- migrate: rollback
-
-        -- Squash four statements.
-
-        DROP TABLE four;
-
-        -- Squash three statements.
-
-        DROP TABLE three;
-        """)
-
-        assert sorted([path.stem for path in migrations.iterdir() if path.suffix in {".py", ".sql"}]) == [
+        assert _migration_ids(migrations) == [
             "20210101_01_abcd-first-migration",
             "20210101_02_efgh-second-migration",
             "20210101_04_mnop-fourth-migration",
@@ -1783,7 +1454,7 @@ class TestSquash:
         result = cli_runner.invoke(["squash"])
         assert result.exit_code == 0, result.output
 
-        assert sorted([path.stem for path in migrations.iterdir() if path.suffix in {".py", ".sql"}]) == [
+        assert _migration_ids(migrations) == [
             "20210101_01_abcd-first-migration",
         ]
 
@@ -1829,7 +1500,7 @@ class TestSquash:
         '''),
         )
 
-        assert sorted([path.stem for path in migrations.iterdir() if path.suffix in {".py", ".sql"}]) == []
+        assert _migration_ids(migrations) == []
 
     def test_keep_python_file(self, migration_file_factory, cli_runner, migrations):
         migration_file_factory(
@@ -1853,7 +1524,7 @@ class TestSquash:
         result = cli_runner.invoke(["squash", "--skip-prompt"], input="n\nn\n")
         assert result.exit_code == 0, result.output
 
-        assert sorted([path.stem for path in migrations.iterdir() if path.suffix in {".py", ".sql"}]) == [
+        assert _migration_ids(migrations) == [
             "20210101_01_abcd-first-migration",
         ]
 
@@ -1875,42 +1546,20 @@ class TestSquash:
         result = cli_runner.invoke(["squash"])
         assert result.exit_code == 0, result.output
 
-        assert sorted([path.stem for path in migrations.iterdir() if path.suffix in {".py", ".sql"}]) == [
+        assert _migration_ids(migrations) == [
             "20210101_01_abcd-first-migration",
         ]
 
-    def test_backups_kept(self, migration_file_factory, cli_runner, migrations):
-        migration_file_factory(
-            "20210101_01_abcd-first-migration",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE one (id INT);
-            -- migrate: rollback
-            DROP TABLE one;
-            """),
-        )
-        migration_file_factory(
-            "20210101_02_efgh-second-migration",
-            "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_abcd-first-migration
-
-            -- migrate: apply
-            CREATE TABLE two (id INT);
-            -- migrate: rollback
-            DROP TABLE two;
-            """),
+    def test_backups_kept(self, migration_files_factory, cli_runner, migrations):
+        migration_files_factory(
+            ("20210101_01_abcd-first-migration", "sql", _FIRST_MIGRATION),
+            ("20210101_02_efgh-second-migration", "sql", _SECOND_MIGRATION),
         )
 
         result = cli_runner.invoke(["squash", "--backup"])
         assert result.exit_code == 0, result.output
 
-        assert sorted([path.name for path in migrations.iterdir()]) == [
+        assert _listdir(migrations) == [
             "20210101_01_abcd-first-migration.sql.bak",
             "20210101_02_efgh-second-migration.sql",
             "20210101_02_efgh-second-migration.sql.bak",
@@ -1920,57 +1569,16 @@ class TestSquash:
         old = migration_file_factory(
             "20210101_01_abcd-first-migration",
             "sql",
-            dedent("""
-            -- commit
-            -- depends:
-
-            -- migrate: apply
-            CREATE TABLE one (id INT);
-            -- migrate: rollback
-            DROP TABLE one;
-            """),
+            _FIRST_MIGRATION,
         )
         new = migration_file_factory(
             "20210101_02_efgh-second-migration",
             "sql",
-            dedent("""
-            -- commit
-            -- depends: 20210101_01_abcd-first-migration
-
-            -- migrate: apply
-            CREATE TABLE two (id INT);
-            -- migrate: rollback
-            DROP TABLE two;
-            """),
+            _SECOND_MIGRATION,
         )
 
         result = cli_runner.invoke(["squash", "--source"])
         assert result.exit_code == 0, result.output
 
         assert old.exists() is False
-        assert new.read_text() == dedent("""\
-        -- commit
-        -- depends:
-
-        -- squashed: 20210101_01_abcd-first-migration
-
-        -- migrate: apply
-
-        -- Squash one statements.
-
-        CREATE TABLE one (id INT); -- source: 20210101_01_abcd-first-migration
-
-        -- Squash two statements.
-
-        CREATE TABLE two (id INT); -- source: 20210101_02_efgh-second-migration
-
-        -- migrate: rollback
-
-        -- Squash two statements.
-
-        DROP TABLE two; -- source: 20210101_02_efgh-second-migration
-
-        -- Squash one statements.
-
-        DROP TABLE one; -- source: 20210101_01_abcd-first-migration
-        """)
+        assert new.read_text() == _EXPECTED_SOURCES_TRACKED
@@ -1,4 +1,5 @@
 import os
+from unittest import mock
 
 import pytest
 
@@ -45,6 +46,25 @@ def test_find_config_not_found():
     assert p is None
 
 
+def test_find_config_ignores_directory(cwd):
+    p = cwd / "pyproject.toml"
+
+    with p.open("w") as f:
+        f.write("""
+[tool.pogo]
+migrations = "./migrations"
+database_config = "{POSTGRES_DSN}"
+""")
+
+    subdir = cwd / "sub"
+    (subdir / "pyproject.toml").mkdir(parents=True)
+    os.chdir(str(subdir))
+
+    path = config.find_config()
+
+    assert path == p
+
+
 @pytest.mark.usefixtures("cwd")
 def test_load_config_not_found():
     with pytest.raises(exceptions.InvalidConfigurationError) as e:
@@ -104,6 +124,43 @@ database_config = "{POSTGRES_DSN}"
     )
 
 
+def test_load_toml_reuses_parse_until_modified(cwd, monkeypatch):
+    p = cwd / "pyproject.toml"
+    p.write_text('[tool.pogo]\nmigrations = "./migrations"\n')
+
+    data = config.load_toml(p)
+    monkeypatch.setattr(config.rtoml, "loads", mock.Mock(side_effect=AssertionError))
+
+    assert config.load_toml(p) == data
+
+    monkeypatch.undo()
+    p.write_text('[tool.pogo]\nmigrations = "./other-migrations"\n')
+
+    assert config.load_toml(p) == {"tool": {"pogo": {"migrations": "./other-migrations"}}}
+
+
+def test_load_toml_not_stale_for_same_size_rewrite(cwd):
+    p = cwd / "pyproject.toml"
+    p.write_text('[tool.pogo]\nmigrations = "./migrations-a"\n')
+    st = p.stat()
+
+    assert config.load_toml(p) == {"tool": {"pogo": {"migrations": "./migrations-a"}}}
+
+    p.write_text('[tool.pogo]\nmigrations = "./migrations-b"\n')
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert config.load_toml(p) == {"tool": {"pogo": {"migrations": "./migrations-b"}}}
+
+
+def test_load_toml_result_mutation_not_cached(cwd):
+    p = cwd / "pyproject.toml"
+    p.write_text('[tool.pogo]\nmigrations = "./migrations"\n')
+
+    config.load_toml(p)["tool"]["pogo"]["migrations"] = "./changed"
+
+    assert config.load_toml(p) == {"tool": {"pogo": {"migrations": "./migrations"}}}
+
+
 def test_config_database_config_dsn_not_set(cwd):
     c = config.Config(
         root_directory=cwd,
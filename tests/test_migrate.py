@@ -2,6 +2,7 @@ import pytest
 
 import pogo_migrate.config
 from pogo_migrate import exceptions, migrate
+from tests.util import fetch_tables
 
 
 @pytest.fixture
@@ -90,15 +91,7 @@ DROP TABLE table_four;
 
 class Base:
     async def assert_tables(self, db_session, tables):
-        stmt = """
-        SELECT tablename
-        FROM pg_tables
-        WHERE  schemaname = 'public'
-        ORDER BY tablename
-        """
-        results = await db_session.fetch(stmt)
-
-        assert [r["tablename"] for r in results] == tables
+        assert await fetch_tables(db_session) == tables
 
 
 class TestApply(Base):
@@ -129,6 +122,30 @@ class TestApply(Base):
         await self.assert_tables(db_session, ["_pogo_migration", "_pogo_version", "table_one", "table_two"])
         assert str(e.value) == "Failed to apply 20240318_01_12345-broken-apply"
 
+    async def test_cycle_reports_only_looped_migrations(self, config, db_session, context, migrations):
+        for mig_id, depends in [
+            ("20240319_01_12345-loop-one", "20240319_02_12345-loop-two"),
+            ("20240319_02_12345-loop-two", "20240319_01_12345-loop-one"),
+            ("20240319_03_12345-downstream", "20240319_02_12345-loop-two"),
+        ]:
+            (migrations / f"{mig_id}.sql").write_text(f"""
+-- {mig_id}
+-- depends: {depends}
+
+-- migrate: apply
+-- migrate: rollback
+""")
+
+        with pytest.raises(exceptions.BadMigrationError) as e:
+            await migrate.apply(context, config, db_session)
+
+        # Directory listing order is not fixed, the downstream migration must not be reported.
+        msg = str(e.value)
+        assert msg.startswith("Circular dependencies among these migrations ")
+        assert "20240319_01_12345-loop-one" in msg
+        assert "20240319_02_12345-loop-two" in msg
+        assert "20240319_03_12345-downstream" not in msg
+
 
 class TestRollback(Base):
     @pytest.mark.usefixtures("migrations")
@@ -137,6 +154,13 @@ class TestRollback(Base):
 
         await self.assert_tables(db_session, ["_pogo_migration", "_pogo_version"])
 
+    async def test_nothing_applied_skips_loading(self, config, db_session, context, migrations):
+        (migrations / "20240318_01_12345-invalid.sql").write_text("-- invalid migration\n")
+
+        await migrate.rollback(context, config, db_session)
+
+        await self.assert_tables(db_session, ["_pogo_migration", "_pogo_version"])
+
     @pytest.mark.usefixtures("_migration_two")
     async def test_latest_removed(self, config, db_session, context):
         await migrate.apply(context, config, db_session)
@@ -1,10 +1,13 @@
+import gc
 import inspect
+import os
 import random
 from pathlib import Path
 from textwrap import dedent
 from unittest import mock
 
 import pytest
+import sqlparse
 
 from pogo_migrate import exceptions, migration
 from tests.util import AsyncMock
@@ -74,6 +77,9 @@ class TestReadSqlMigration:
         )
         message, depends, _, _, _, _, _ = migration.read_sql_migration(mp)
 
+        assert message == "migration message"
+        assert depends == "20200101_01_rando-initial-commit"
+
     async def test_apply_func_created(self, migration_file_factory):
         mp = migration_file_factory(
             "20210101_01_rando-migration-message",
@@ -95,7 +101,7 @@ class TestReadSqlMigration:
         )
         _, _, apply, _, _, apply_statements, _ = migration.read_sql_migration(mp)
 
-        assert apply_statements == [
+        assert apply_statements == (
             "CREATE TABLE table_one();",
             "CREATE TABLE table_two();",
             dedent("""\
@@ -104,14 +110,14 @@ class TestReadSqlMigration:
                 name VARCHAR(100) NOT NULL,
                 CONSTRAINT uc_name UNIQUE (name)
             );"""),
-        ]
+        )
         db = mock.Mock(execute=AsyncMock())
         await apply(db)
         assert db.execute.call_args_list == [
-            mock.call("CREATE TABLE table_one();"),
-            mock.call("CREATE TABLE table_two();"),
             mock.call(
                 dedent("""\
+            CREATE TABLE table_one();
+            CREATE TABLE table_two();
             CREATE TABLE public.user (
                 id BIGSERIAL PRIMARY KEY,
                 name VARCHAR(100) NOT NULL,
@@ -145,7 +151,7 @@ class TestReadSqlMigration:
         )
         _, _, _, rollback, _, _, rollback_statements = migration.read_sql_migration(mp)
 
-        assert rollback_statements == [
+        assert rollback_statements == (
             "DROP TABLE table_two;",
             "DROP TABLE table_one;",
             dedent("""\
@@ -155,14 +161,14 @@ class TestReadSqlMigration:
                 CONSTRAINT uc_name UNIQUE (name)
             );"""),
             "-- final comment;",
-        ]
+        )
         db = mock.Mock(execute=AsyncMock())
         await rollback(db)
         assert db.execute.call_args_list == [
-            mock.call("DROP TABLE table_two;"),
-            mock.call("DROP TABLE table_one;"),
             mock.call(
                 dedent("""\
+            DROP TABLE table_two;
+            DROP TABLE table_one;
             CREATE TABLE public.user (
                 id BIGSERIAL PRIMARY KEY,
                 name VARCHAR(100) NOT NULL,
@@ -171,6 +177,31 @@ class TestReadSqlMigration:
             ),
         ]
 
+    async def test_apply_func_no_transaction_executes_statements(self, migration_file_factory):
+        mp = migration_file_factory(
+            "20210101_01_rando-migration-message",
+            "sql",
+            dedent("""
+            --
+            -- depends:
+            -- transaction: false
+
+            -- migrate: apply
+            CREATE TABLE table_one();
+            -- a comment
+            CREATE INDEX CONCURRENTLY idx_one ON table_one (id);
+            -- migrate: rollback
+            """),
+        )
+        _, _, apply, _, _, _, _ = migration.read_sql_migration(mp)
+
+        db = mock.Mock(execute=AsyncMock())
+        await apply(db)
+        assert db.execute.call_args_list == [
+            mock.call("CREATE TABLE table_one();"),
+            mock.call("CREATE INDEX CONCURRENTLY idx_one ON table_one (id);"),
+        ]
+
     @pytest.mark.parametrize(
         ("flag", "expected"),
         [
@@ -199,6 +230,119 @@ class TestReadSqlMigration:
         _, _, _, _, in_transaction, _, _ = migration.read_sql_migration(mp)
         assert in_transaction == expected
 
+    def test_parse_cached_until_modified(self, migration_file_factory):
+        mp = migration_file_factory(
+            "20210101_01_rando-migration-message",
+            "sql",
+            dedent("""
+            -- migration message
+            -- depends:
+
+            -- migrate: apply
+            CREATE TABLE table_one();
+
+            -- migrate: rollback
+            DROP TABLE table_one;
+            """),
+        )
+        parsed = migration.read_sql_migration(mp)
+
+        assert migration.read_sql_migration(mp) is parsed
+
+        mp.write_text(
+            dedent("""
+            -- updated message
+            -- depends:
+
+            -- migrate: apply
+            CREATE TABLE table_two();
+
+            -- migrate: rollback
+            DROP TABLE table_two;
+            """),
+        )
+        message, _, _, _, _, apply_statements, _ = migration.read_sql_migration(mp)
+
+        assert message == "updated message"
+        assert apply_statements == ("CREATE TABLE table_two();",)
+
+    def test_parse_not_stale_for_same_size_rewrite(self, migration_file_factory):
+        mp = migration_file_factory(
+            "20210101_01_rando-migration-message",
+            "sql",
+            dedent("""
+            -- migration message
+            -- depends: 20210101_01_abcde
+
+            -- migrate: apply
+
+            -- migrate: rollback
+            """),
+        )
+        st = mp.stat()
+        _, depends, _, _, _, _, _ = migration.read_sql_migration(mp)
+        assert depends == "20210101_01_abcde"
+
+        mp.write_text(mp.read_text().replace("20210101_01_abcde", "20210101_01_fghij"))
+        os.utime(mp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        _, depends, _, _, _, _, _ = migration.read_sql_migration(mp)
+
+        assert depends == "20210101_01_fghij"
+
+
+class TestSplitStatements:
+    @pytest.mark.parametrize(
+        ("sql", "expected"),
+        [
+            ("", []),
+            ("CREATE TABLE one();", ["CREATE TABLE one();"]),
+            ("CREATE TABLE one();\nCREATE TABLE two()", ["CREATE TABLE one();", "CREATE TABLE two()"]),
+            ("INSERT INTO one VALUES ('a;b', 'it''s');", ["INSERT INTO one VALUES ('a;b', 'it''s');"]),
+            ('DROP TABLE "odd;name";', ['DROP TABLE "odd;name";']),
+            (
+                "CREATE RULE r AS ON INSERT TO one DO (SELECT 1; SELECT 2);",
+                ["CREATE RULE r AS ON INSERT TO one DO (SELECT 1; SELECT 2);"],
+            ),
+            (
+                "SELECT 1; -- one\n-- still one\n\n-- two\nSELECT 2;",
+                ["SELECT 1; -- one\n-- still one", "-- two\nSELECT 2;"],
+            ),
+            ("/* a; b */ SELECT 1;", ["/* a; b */ SELECT 1;"]),
+            (
+                "CREATE FUNCTION f() RETURNS int AS $f$ SELECT 1; $f$ LANGUAGE sql;",
+                ["CREATE FUNCTION f() RETURNS int AS $f$ SELECT 1; $f$ LANGUAGE sql;"],
+            ),
+            ("SELECT 1;\n-- trailing comment", ["SELECT 1;", "-- trailing comment"]),
+            (
+                "SELECT $q$ a; $Q$ b; $q$;\nSELECT 2;",
+                ["SELECT $q$ a; $Q$ b; $q$;", "SELECT 2;"],
+            ),
+        ],
+    )
+    def test_split(self, sql, expected):
+        assert migration._split_statements(sql) == expected
+        assert migration.split_statements(sql) == expected
+
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "CREATE FUNCTION f() RETURNS void AS 'BEGIN; SELECT 1; END;' LANGUAGE plpgsql;\nSELECT 1;",
+            "DO $$ BEGIN PERFORM 1; END $$;\nSELECT 1;",
+            "SELECT 'it\\'s; fine';\nSELECT 1;",
+            "SELECT `odd;name`;\nSELECT 1;",
+            "SELECT 1 +-- it's\n 2;\nSELECT 1;",
+            "SELECT 1; # comment\nSELECT 2;",
+        ],
+    )
+    def test_split_matches_sqlparse(self, sql):
+        assert migration.split_statements(sql) == sqlparse.split(sql)
+
+    def test_split_falls_back_for_blocks(self):
+        sql = "BEGIN;\nCREATE TABLE one();\nCOMMIT;"
+
+        assert migration._split_statements(sql) is None
+        assert migration.split_statements(sql) == ["BEGIN;", "CREATE TABLE one();", "COMMIT;"]
+
 
 class TestMigration:
     def test_migrations_superset_tracked(self):
@@ -211,9 +355,18 @@ class TestMigration:
             "20210101_02_rando-commit": m2,
             "20210101_03_rando-commit": m3,
         }
-        assert m._Migration__migrations == expected
-        assert m2._Migration__migrations == expected
-        assert m3._Migration__migrations == expected
+        assert dict(m._Migration__migrations) == expected
+        assert dict(m2._Migration__migrations) == expected
+        assert dict(m3._Migration__migrations) == expected
+
+    def test_migrations_untracked_when_released(self):
+        m = migration.Migration("20210101_01_rando-commit", Path("20210101_01_rando-commit.sql"), set())
+        m2 = migration.Migration("20210101_02_rando-commit", Path("20210101_02_rando-commit.sql"), set())
+
+        del m2
+        gc.collect()
+
+        assert dict(m._Migration__migrations) == {"20210101_01_rando-commit": m}
 
     def test_applied(self):
         m = migration.Migration(
@@ -484,6 +637,24 @@ class TestTopologicalSort:
         random.shuffle(migrations)
         assert migration.topological_sort(migrations) == [m, m2, m3]
 
+    def test_independent_migrations_keep_order(self):
+        m = migration.Migration("mig1", Path("mig1.sql"), None)
+        m2 = migration.Migration("mig2", Path("mig2.sql"), None)
+        m3 = migration.Migration("mig3", Path("mig3.sql"), None)
+
+        assert migration.topological_sort([m3, m, m2]) == [m3, m, m2]
+
+    def test_released_migrations_keep_order(self):
+        a = migration.Migration("a", Path("a.sql"), None)
+        b = migration.Migration("b", Path("b.sql"), None)
+        c = migration.Migration("c", Path("c.sql"), None)
+        d = migration.Migration("d", Path("d.sql"), None)
+        a._depends = frozenset([b])
+        d._depends = frozenset([c])
+
+        # a is released by b, and must come before c which was ready earlier.
+        assert migration.topological_sort([b, a, c, d]) == [b, a, c, d]
+
     def test_cyclic_error(self, migration_file_factory):
         mp = migration_file_factory(
             "mig1",
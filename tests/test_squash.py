@@ -1,9 +1,11 @@
 from pathlib import Path
 from textwrap import dedent
+from unittest import mock
 
 import pytest
 
 from pogo_migrate import migration, squash
+from pogo_migrate.context import Context
 
 
 def test_remove_no_dependent(migration_file_factory, context):
@@ -500,6 +502,77 @@ def test_rollback_data_statements_first_reversed_from_discovery_order(migration_
     )
 
 
+def test_repeated_idempotent_statements_collapsed(migration_file_factory):
+    mp = migration_file_factory(
+        "20210101_01_rando-commit",
+        "sql",
+        dedent("""
+        -- commit
+        -- depends:
+
+        -- migrate: apply
+        -- migrate: rollback
+        """),
+    )
+
+    m = migration.Migration(mp.stem, mp, None)
+    m.load()
+
+    apply_statements = {
+        "pgcrypto": [
+            "CREATE EXTENSION IF NOT EXISTS pgcrypto;",
+            "CREATE EXTENSION IF NOT EXISTS pgcrypto;",
+            "DROP EXTENSION pgcrypto;",
+            "CREATE EXTENSION IF NOT EXISTS pgcrypto;",
+        ],
+        "table1": ["ALTER TABLE table1 ADD COLUMN a INT;", "ALTER TABLE table1 ADD COLUMN a INT;"],
+    }
+    rollback_statements = {
+        "pgcrypto": [["DROP EXTENSION IF EXISTS pgcrypto;"], ["DROP EXTENSION IF EXISTS pgcrypto;"]],
+    }
+    new = squash.write(apply_statements, rollback_statements, m, "previous-1", ["squash-1", "squash-2", m.id])
+
+    content = new.path.read_text()
+    assert (
+        dedent("""
+    -- migrate: apply
+
+    -- Squash pgcrypto statements.
+
+    CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+    DROP EXTENSION pgcrypto;
+
+    CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+    -- Squash table1 statements.
+
+    ALTER TABLE table1 ADD COLUMN a INT;
+
+    ALTER TABLE table1 ADD COLUMN a INT;
+
+    -- migrate: rollback
+
+    -- Squash pgcrypto statements.
+
+    DROP EXTENSION IF EXISTS pgcrypto;
+    """)
+        in content
+    )
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "ALTER TABLE table1 ADD COLUMN IF NOT EXISTS a INT, ADD COLUMN b INT;",
+        "ALTER TABLE IF EXISTS table1 ADD COLUMN b INT;",
+        "DO $$ BEGIN IF EXISTS (SELECT 1 FROM table1) THEN INSERT INTO table1 VALUES (1); END IF; END $$;",
+    ],
+)
+def test_repeated_partially_guarded_statements_kept(statement):
+    assert squash._collapse_repeats([statement, statement]) == [statement, statement]
+
+
 @pytest.mark.parametrize(
     ("statement", "expected_type"),
     [
@@ -578,6 +651,16 @@ def test_parse_sqlglot_identifier_aborts_at_table_keyword(statement, context):
         squash.parse_sqlglot(context, statement)
 
 
+def test_parse_sqlglot_caches_repeated_statements(context):
+    squash._parse_sqlglot.cache_clear()
+    with mock.patch.object(squash.sqlglot, "parse_one", wraps=squash.sqlglot.parse_one) as parse_one:
+        first = squash.parse_sqlglot(context, "DROP TABLE tbl;")
+        second = squash.parse_sqlglot(context, "DROP TABLE tbl;")
+
+    assert first == second
+    assert parse_one.call_count == 1
+
+
 @pytest.mark.parametrize(
     ("statement", "expected_identifier"),
     [
@@ -621,3 +704,28 @@ def test_parse_identifier(statement, expected_identifier, context):
     parsed = squash.parse(context, statement)
 
     assert parsed.identifier == expected_identifier
+
+
+@pytest.mark.parametrize(
+    ("statement", "expected_type", "expected_identifier"),
+    [
+        ("CREATE TABLE public.tbl (id INT);", "CREATE", "tbl"),
+        ("create index ix_table_id on tbl (id);", "CREATE", "tbl"),
+        ('ALTER TABLE "Lock" ADD COLUMN id INT;', "ALTER", "Lock"),
+        ("DROP INDEX CONCURRENTLY IF EXISTS ix_table_id;", "DROP", "ix_table_id"),
+    ],
+)
+def test_parse_simple_ddl_skips_sqlparse(statement, expected_type, expected_identifier, context, monkeypatch):
+    monkeypatch.setattr(squash.sqlparse, "parse", mock.Mock(side_effect=AssertionError))
+
+    parsed = squash.parse(context, statement)
+
+    assert parsed.statement_type == expected_type
+    assert parsed.identifier == expected_identifier
+
+
+def test_parse_simple_ddl_debug_output_tokens(capsys):
+    parsed = squash.parse(Context(3), "CREATE TABLE tbl (id INT);")
+
+    assert parsed.identifier == "tbl"
+    assert capsys.readouterr().out.startswith("parsed tokens: [<DDL 'CREATE' ")
@@ -54,6 +54,21 @@ class TestTopologicalSort:
         with pytest.raises(topologicalsort.CycleError):
             self.check("ABCD", "AB BC CA", "")
 
+    @pytest.mark.parametrize(
+        ("edges", "expected"),
+        [
+            ("AA BA", ["A"]),
+            ("AB BA CA DC", ["A", "B"]),
+            ("BC CB DB", ["B", "C"]),
+            ("AB BA CD DC", ["A", "B", "C", "D"]),
+        ],
+    )
+    def test_it_reports_only_cycle_members(self, edges, expected):
+        with pytest.raises(topologicalsort.CycleError) as e:
+            self.check("ABCD", edges, "")
+
+        assert e.value.args[1] == expected
+
     def test_it_handles_multiple_edges_to_the_same_node(self):
         self.check("ABCD", "BA CA DA", "ABCD")  # pragma: no-spell-check
         self.check("DCBA", "BA CA DA", "ADCB")  # pragma: no-spell-check
@@ -1,3 +1,4 @@
+import dataclasses
 import string
 from datetime import datetime, timezone
 from unittest import mock
@@ -26,6 +27,7 @@ def config(pyproject):  # noqa: ARG001
         ("$tr4nge message", "tr4nge-message"),
         ("   a  lot  of   whitespace", "a-lot-of-whitespace"),
         ("non a$c!! message", "non-a-c-message"),
+        ("crème brûlée", "creme-brulee"),
     ],
 )
 def test_slugify(message, slug):
@@ -41,7 +43,7 @@ def test_random_string():
 
 
 def test_make_file(config, monkeypatch):
-    monkeypatch.setattr(util.random, "choices", mock.Mock(return_value="rando"))
+    monkeypatch.setattr(util, "random_string", mock.Mock(return_value="rando"))
     p = util.make_file(config, "a message", ".sql")
     datestr = datetime.now(tz=timezone.utc).date().strftime("%Y%m%d")
 
@@ -50,8 +52,8 @@ def test_make_file(config, monkeypatch):
 
 
 def test_make_file_increments_counter(monkeypatch, config, migrations):
-    config.migrations = migrations
-    monkeypatch.setattr(util.random, "choices", mock.Mock(return_value="rando"))
+    config = dataclasses.replace(config, migrations=migrations)
+    monkeypatch.setattr(util, "random_string", mock.Mock(return_value="rando"))
     datestr = datetime.now(tz=timezone.utc).date().strftime("%Y%m%d")
 
     for i in range(10):
@@ -8,3 +8,15 @@ class AsyncMock(mock.MagicMock):
 
     async def __call__(self, *args, **kwargs):
         return super().__call__(*args, **kwargs)
+
+
+PUBLIC_TABLES_SQL = """
+SELECT tablename
+FROM pg_tables
+WHERE  schemaname = 'public'
+ORDER BY tablename
+"""
+
+
+async def fetch_tables(db_session):
+    return [r["tablename"] for r in await db_session.fetch(PUBLIC_TABLES_SQL)]